@@ -1,6 +1,7 @@
+from collections import OrderedDict
 import sys
 
-PY36 = False
+PY36 = PY37 = False
 if sys.version_info[0] == 2:
     PY2 = True
     PY3 = False
@@ -13,3 +14,16 @@ else:
     Unicode = str
     if sys.version_info[1] >= 6:
         PY36 = True
+    if sys.version_info[1] >= 7:
+        PY37 = True
+
+if PY37:
+    # dicts preserve insertion order and are faster and smaller:
+    ordered_dict = dict
+else:
+    ordered_dict = OrderedDict
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # pragma: no cover
+    from collections import MutableMapping
@@ -0,0 +1,73 @@
+from .compat import ordered_dict
+
+
+class Context(object):
+    """
+    An immutable link in a chain of context bound to a
+    :class:`~shoehorn.logger.Logger`.
+
+    Binding more context creates a new link that refers to its parent, so
+    it takes constant time no matter how much context is already bound.
+    The chain is only flattened into a mapping when an event is logged,
+    and that mapping is then cached on the link.
+
+    Serializers can also cache their rendering of the context on the link,
+    see :meth:`rendered`, so values that are bound should not be modified.
+    """
+
+    __slots__ = ('parent', 'items', '_flat', '_rendered')
+
+    def __init__(self, parent=None, items=()):
+        self.parent = parent
+        self.items = tuple(items)
+        self._flat = None
+        self._rendered = None
+
+    def bind(self, items):
+        """
+        Return a new :class:`Context` with the supplied sequence of
+        ``(name, value)`` tuples added to this one.
+        """
+        return Context(self, items)
+
+    def flatten(self):
+        """
+        Return a mapping of all the context in this chain, with names
+        bound later overriding those bound earlier.
+
+        .. warning::
+
+          The mapping returned is cached and shared, so must not be modified.
+        """
+        flat = self._flat
+        if flat is None:
+            links = []
+            link = self
+            while link is not None and link._flat is None:
+                links.append(link)
+                link = link.parent
+            flat = ordered_dict() if link is None else ordered_dict(link._flat)
+            for link in reversed(links):
+                flat.update(link.items)
+            self._flat = flat
+        return flat
+
+    def rendered(self, key, render):
+        """
+        Return the result of calling `render` with the flattened context,
+        which is cached using the supplied key. The key should identify the
+        format and configuration of the serializer doing the rendering.
+        """
+        rendered = self._rendered
+        if rendered is None:
+            rendered = self._rendered = {}
+        try:
+            return rendered[key]
+        except KeyError:
+            result = rendered[key] = render(self.flatten())
+            return result
+
+    def __repr__(self):
+        return 'Context('+', '.join(
+            '{}={!r}'.format(k, v) for (k, v) in self.flatten().items()
+        )+')'
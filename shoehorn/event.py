@@ -1,24 +1,213 @@
 from collections import OrderedDict
 
-from shoehorn.compat import text_types
+from shoehorn.compat import text_types, MutableMapping, ordered_dict
 
 
-class Event(OrderedDict):
+def serialize(items, exclude_keys=frozenset(),
+              join=', '.join, kw='=', quote=repr):
+    """
+    Serialize a sequence of ``(key, value)`` pairs, as described in
+    :meth:`BaseEvent.serialize`.
+    """
+    return join(str(k)+kw+quote(v) for (k, v) in items
+                if k not in exclude_keys)
+
+
+def extract_newline_values(items, exclude_keys=frozenset(),
+                           prefix='\n', kw=':\n'):
+    """
+    Extract the text values containing newlines from a sequence of
+    ``(key, value)`` pairs, as described in
+    :meth:`BaseEvent.extract_newline_values`.
+    """
+    exclude = set(exclude_keys)
+    parts = []
+    for k, v in items:
+        if k not in exclude and isinstance(v, text_types) and '\n' in v:
+            parts.append(prefix+k+kw+v)
+            exclude.add(k)
+    return exclude, ''.join(parts)
+
+
+def render(items, exclude_keys=frozenset(), join=', '.join, kw='=',
+           quote=repr, prefix='\n', newline_kw=':\n', only=None):
+    """
+    Render a sequence of ``(key, value)`` pairs in a single pass, as
+    described in :meth:`BaseEvent.render`.
+    """
+    parts = []
+    post = []
+    for k, v in items:
+        if k in exclude_keys or (only is not None and k not in only):
+            continue
+        if isinstance(v, text_types) and '\n' in v:
+            post.append(prefix+k+newline_kw+v)
+        else:
+            parts.append(str(k)+kw+quote(v))
+    return join(parts), ''.join(post)
+
+
+class BaseEvent(object):
+    """
+    The rendering methods shared by :class:`Event` and :class:`LazyEvent`.
+    """
+
+    __slots__ = ()
 
     def serialize(self, exclude_keys=frozenset(),
                   join=', '.join, kw='=', quote=repr):
-        return join(str(k)+kw+quote(v) for (k, v) in self.items()
-                    if k not in exclude_keys)
+        return serialize(self.items(), exclude_keys, join, kw, quote)
 
     def extract_newline_values(self, exclude_keys=frozenset(),
                                prefix='\n', kw=':\n'):
-        exclude = set(exclude_keys)
-        parts = []
-        for k, v in self.items():
-            if k not in exclude and isinstance(v, text_types) and '\n' in v:
-                parts.append(prefix+k+kw+v)
-                exclude.add(k)
-        return exclude, ''.join(parts)
+        return extract_newline_values(self.items(), exclude_keys, prefix, kw)
+
+    def render(self, exclude_keys=frozenset(), join=', '.join, kw='=',
+               quote=repr, prefix='\n', newline_kw=':\n', only=None):
+        """
+        Render the event for display in a single pass, returning a tuple of
+        the serialized text of its values along with the extracted values
+        that contain newlines, in the same way as
+        :meth:`extract_newline_values` followed by :meth:`serialize`.
+
+        For speed, `exclude_keys` and `only`, which restricts rendering to
+        the keys it contains, should be sets computed once up front.
+        """
+        return render(self.items(), exclude_keys, join, kw, quote,
+                      prefix, newline_kw, only)
 
     def __repr__(self):
         return 'Event('+self.serialize()+')'
+
+
+class OrderedEvent(BaseEvent, OrderedDict):
+    """
+    An event backed by an :class:`~collections.OrderedDict`, which is what
+    :class:`Event` uses on Pythons where :class:`dict` does not preserve
+    insertion order.
+    """
+
+
+class Event(BaseEvent, ordered_dict):
+    """
+    A mapping of the information to be logged, backed by :class:`dict` on
+    Python 3.7 and above, where it preserves insertion order while being
+    smaller and faster than an :class:`~collections.OrderedDict`.
+    """
+
+    def copy(self):
+        # dict.copy() would return a plain dict:
+        return self.__class__(self)
+
+
+class LazyEvent(BaseEvent, MutableMapping):
+    """
+    A read-through view over the context bound to a
+    :class:`~shoehorn.logger.Logger` and the values passed when logging.
+
+    Values set on the event are stored along with those passed when logging,
+    so the bound context is only copied into an :class:`Event` if a key
+    from it is deleted or :meth:`materialize` is called.
+
+    :param context:
+      A mapping of the bound context, which will never be modified.
+
+    :param values:
+      A mapping of the values passed when logging, which will be modified
+      when values are set on the event.
+
+    :param bound:
+      The :class:`~shoehorn.context.Context` from which `context` was
+      flattened, if any, on which serializers can cache their rendering of
+      the bound context.
+    """
+
+    __slots__ = ('context', 'values', 'bound', 'event')
+
+    def __init__(self, context, values, bound=None):
+        self.context = context
+        self.values = values
+        self.bound = bound
+        self.event = None
+
+    def split(self):
+        """
+        If the bound context can be rendered separately from the values
+        logged, return the :class:`~shoehorn.context.Context` it came from
+        and the mapping of values, otherwise return ``None``.
+
+        This is only possible when the event has not been materialized and
+        none of the logged values replace ones from the bound context.
+        """
+        if self.bound is None or self.event is not None:
+            return None
+        context = self.context
+        for key in self.values:
+            if key in context:
+                return None
+        return self.bound, self.values
+
+    def materialize(self):
+        """
+        Return an :class:`Event` containing the merged contents of this view,
+        which will be used for all subsequent access.
+        """
+        event = self.event
+        if event is None:
+            event = Event(self.context)
+            event.update(self.values)
+            self.event = event
+        return event
+
+    def __getitem__(self, key):
+        if self.event is not None:
+            return self.event[key]
+        values = self.values
+        if key in values:
+            return values[key]
+        return self.context[key]
+
+    def get(self, key, default=None):
+        if self.event is not None:
+            return self.event.get(key, default)
+        values = self.values
+        if key in values:
+            return values[key]
+        return self.context.get(key, default)
+
+    def __contains__(self, key):
+        if self.event is not None:
+            return key in self.event
+        return key in self.values or key in self.context
+
+    def __setitem__(self, key, value):
+        if self.event is not None:
+            self.event[key] = value
+        else:
+            self.values[key] = value
+
+    def __delitem__(self, key):
+        if self.event is None and key not in self.context:
+            del self.values[key]
+        else:
+            del self.materialize()[key]
+
+    def __iter__(self):
+        if self.event is not None:
+            return iter(self.event)
+        return self._iter()
+
+    def _iter(self):
+        context = self.context
+        for key in context:
+            yield key
+        for key in self.values:
+            if key not in context:
+                yield key
+
+    def __len__(self):
+        if self.event is not None:
+            return len(self.event)
+        context = self.context
+        return len(context) + sum(1 for key in self.values
+                                  if key not in context)
@@ -0,0 +1,25 @@
+from logging import DEBUG, INFO, WARNING, ERROR, CRITICAL
+
+#: The numeric values of the levels used by :class:`~shoehorn.logger.Logger`,
+#: which match those used by the standard library, along with the aliases
+#: the standard library also accepts.
+LEVELS = {
+    'debug': DEBUG,
+    'info': INFO,
+    'warning': WARNING,
+    'warn': WARNING,
+    'error': ERROR,
+    'critical': CRITICAL,
+    'fatal': CRITICAL,
+}
+
+
+def level_number(level, default=None):
+    """
+    Return the numeric value of the supplied level, which may be either
+    a number or one of the names in :data:`LEVELS`. If the level isn't
+    known, `default` is returned.
+    """
+    if isinstance(level, int):
+        return level
+    return LEVELS.get(level, default)
@@ -1,13 +1,44 @@
-from collections import OrderedDict
-
-from .event import Event
+from .compat import ordered_dict
+from .context import Context
+from .event import Event, LazyEvent
+from .levels import DEBUG, INFO, WARNING, ERROR, CRITICAL, level_number
 
 
 class Logger(object):
 
-    def __init__(self, target):
+    def __init__(self, target, level=None, lazy=False):
+        """
+        :param target:
+          The callable to which :class:`~shoehorn.event.Event` instances
+          will be passed.
+
+        :param level:
+          The minimum level, either as a name or a number, at which events
+          will be logged. Calls for lower levels return before an
+          :class:`~shoehorn.event.Event` is created.
+
+        :param lazy:
+          If ``True``, targets will be passed a
+          :class:`~shoehorn.event.LazyEvent` rather than having the bound
+          context and the values passed when logging merged into a new
+          :class:`~shoehorn.event.Event`. This also allows serializers to
+          cache their rendering of bound context, so bound values should not
+          be modified.
+        """
         self.target = target
-        self.context = OrderedDict()
+        self.context = Context()
+        self.lazy = lazy
+        self.set_level(level)
+
+    def set_level(self, level):
+        """
+        Set the minimum level at which this logger will log.
+        ``None`` means all events will be logged.
+        """
+        threshold = 0 if level is None else level_number(level)
+        assert threshold is not None, 'unknown level: {!r}'.format(level)
+        self.level = level
+        self.threshold = threshold
 
     # context methods
 
@@ -26,52 +57,74 @@ class Logger(object):
           A sequence of ``(name, value)`` tuples providing context to bind
           to this logger. The order of these tuples will be preserved.
         """
-        logger = self.__class__(self.target)
-        logger.context.update(self.context)
-        logger.context.update(context)
+        logger = self.__class__(self.target, self.level, self.lazy)
+        logger.context = self.context.bind(context)
         return logger
 
     def alter(self, **context):
-        self.context.update(context)
+        # collapse into a single link so repeated alterations don't keep
+        # growing the chain of contexts:
+        items = ordered_dict(self.context.flatten())
+        items.update(context)
+        self.context = Context(None, tuple(items.items()))
 
     # logging methods
 
     def _log(self, level, args, context):
-        event = Event(self.context)
-        event.update(context)
+        if self.lazy:
+            event = ordered_dict(context)
+        else:
+            event = Event(self.context.flatten())
+            event.update(context)
         event['level'] = level
         if args:
             event['message'] = args[0]
             args = args[1:]
             if args:
                 event['args'] = args
+        if self.lazy:
+            event = LazyEvent(self.context.flatten(), event, self.context)
         self.target(event)
 
     def debug(self, *args, **context):
-        self._log('debug', args, context)
+        if self.threshold <= DEBUG:
+            self._log('debug', args, context)
 
     def info(self, *args, **context):
-        self._log('info', args, context)
+        if self.threshold <= INFO:
+            self._log('info', args, context)
 
     def warning(self, *args, **context):
-        self._log('warning', args, context)
+        if self.threshold <= WARNING:
+            self._log('warning', args, context)
 
     warn = warning
 
     def error(self, *args, **context):
-        self._log('error', args, context)
+        if self.threshold <= ERROR:
+            self._log('error', args, context)
 
     def exception(self, *args, **context):
-        context['exc_info'] = True
-        self._log('error', args, context)
+        if self.threshold <= ERROR:
+            context['exc_info'] = True
+            self._log('error', args, context)
 
     def critical(self, *args, **context):
-        self._log('critical', args, context)
+        if self.threshold <= CRITICAL:
+            self._log('critical', args, context)
 
     fatal = critical
 
+    def enabled_for(self, level):
+        """
+        Returns ``True`` if events at the supplied level will be logged.
+        Levels that aren't known are always logged.
+        """
+        return level_number(level, self.threshold) >= self.threshold
+
     def log(self, level, *args, **context):
-        self._log(level, args, context)
+        if self.enabled_for(level):
+            self._log(level, args, context)
 
     def log_ordered(self, level, *context):
         """
@@ -88,4 +141,5 @@ class Logger(object):
           A sequence of ``(name, value)`` tuples providing the context to log.
           The order of these tuples will be preserved.
         """
-        self._log(level, (), OrderedDict(context))
+        if self.enabled_for(level):
+            self._log(level, (), ordered_dict(context))
@@ -1,14 +1,59 @@
 from logging import getLogger, INFO, Formatter
+import os
+import sys
+
 from .compat import text_types
 
 
 sentinel = object()
 
+package_path = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+UNKNOWN_CALLER = '(unknown file)', 0, '(unknown function)'
+
+
+def find_caller():
+    """
+    Return the path, line number and function name of the first frame on
+    the stack that is not part of shoehorn.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if not code.co_filename.startswith(package_path):
+            return code.co_filename, frame.f_lineno, code.co_name
+        frame = frame.f_back
+    return UNKNOWN_CALLER
+
 
 class StandardLibraryTarget(object):
+    """
+    A target that passes events to the standard library's logging framework.
+
+    :param default_level:
+      The level to use for events with no level or an unknown level.
 
-    def __init__(self, default_level=INFO):
+    :param fast:
+      If ``True``, whether the logger is enabled for the level is checked
+      before anything else is done, and the :class:`~logging.LogRecord` is
+      built and handled directly rather than going through
+      :meth:`~logging.Logger.log`.
+
+    :param find_caller:
+      When `fast` is ``True``, the stack is only searched for the file,
+      line number and function of the caller if this is ``True``.
+
+    :param max_loggers:
+      The maximum number of loggers to keep looked up. If events name more
+      loggers than this, the loggers are looked up afresh.
+    """
+
+    def __init__(self, default_level=INFO, fast=False, find_caller=False,
+                 max_loggers=1000):
         self.default_level=default_level
+        self.fast = fast
+        self.find_caller = find_caller
+        self.max_loggers = max_loggers
         self.loggers = {}
         # do this late in case something adds more levels
         try:
@@ -21,14 +66,23 @@ class StandardLibraryTarget(object):
     def __call__(self, event):
 
         name = event.get('logger')
-        if name not in self.loggers:
-            self.loggers[name] = getLogger(name)
-        logger = self.loggers[name]
+        logger = self.loggers.get(name)
+        if logger is None:
+            if len(self.loggers) >= self.max_loggers:
+                self.loggers.clear()
+            logger = self.loggers[name] = getLogger(name)
 
         level = event.get('level', self.default_level)
         if not isinstance(level, int):
             level = self.levels.get(level, self.default_level)
 
+        if self.fast:
+            if not logger.isEnabledFor(level):
+                return
+            if not event.get('stack_info'):
+                self._handle(logger, level, event)
+                return
+
         kwargs = {}
         for name in ('exc_info', 'stack_info'):
             if name in event:
@@ -44,10 +98,33 @@ class StandardLibraryTarget(object):
             **kwargs
         )
 
+    def _handle(self, logger, level, event):
+        exc_info = event.get('exc_info')
+        if exc_info:
+            if isinstance(exc_info, BaseException):
+                exc_info = (type(exc_info), exc_info,
+                            getattr(exc_info, '__traceback__', None))
+            elif not isinstance(exc_info, tuple):
+                exc_info = sys.exc_info()
+        else:
+            exc_info = None
+        if self.find_caller:
+            path, line, function = find_caller()
+        else:
+            path, line, function = UNKNOWN_CALLER
+        record = logger.makeRecord(
+            logger.name, level, path, line, event.get('message', ''),
+            tuple(event.get('args', ())), exc_info, function
+        )
+        record.shoehorn_event = event
+        logger.handle(record)
+
 
 class ShoehornFormatter(Formatter):
 
-    exclude_keys = {'args', 'exc_info', 'level', 'message', 'stack_info', 'logger'}
+    exclude_keys = frozenset((
+        'args', 'exc_info', 'level', 'message', 'stack_info', 'logger'
+    ))
 
     def __init__(self, fmt='%(message)s%(shoehorn_context)s', *args, **kw):
         super(ShoehornFormatter, self).__init__(fmt, *args, **kw)
@@ -58,9 +135,9 @@ class ShoehornFormatter(Formatter):
             if event is None:
                 record.shoehorn_context = record.shoehorn_post = ''
             else:
-                exclude, post = event.extract_newline_values(self.exclude_keys)
-                record.shoehorn_context = event.serialize(exclude, ' '.join)
-                record.shoehorn_post = post
+                record.shoehorn_context, record.shoehorn_post = event.render(
+                    self.exclude_keys, ' '.join
+                )
 
         if record.shoehorn_context:
             record.shoehorn_context = ' ' + record.shoehorn_context.lstrip()
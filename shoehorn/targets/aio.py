@@ -0,0 +1,187 @@
+"""
+Targets for use in applications built on :mod:`asyncio`.
+
+.. note:: This module requires Python 3.6 or later.
+"""
+from collections import deque
+from sys import exc_info
+from threading import get_ident
+import asyncio
+
+from .compose import handle_error
+
+
+def _get_running_loop():
+    # asyncio.get_running_loop() was only added in Python 3.7:
+    loop = asyncio._get_running_loop()
+    if loop is None:
+        raise RuntimeError('no running event loop')
+    return loop
+
+
+get_running_loop = getattr(asyncio, 'get_running_loop', _get_running_loop)
+
+
+class AsyncTarget(object):
+    """
+    A target that wraps another target, typically a
+    :class:`~shoehorn.targets.serialize.JSON`,
+    :class:`~shoehorn.targets.serialize.LTSV` or
+    :class:`~shoehorn.targets.serialize.Human` serializer, such that logging
+    on the event loop only queues the event. A task on the event loop drains
+    the queue, passing batches of events to the wrapped target in an
+    executor so that blocking writes never happen on the event loop.
+
+    Draining starts when the first event is logged on a running event loop,
+    or when :meth:`start` is called. If the event loop being drained on
+    finishes, for example when :func:`asyncio.run` returns without
+    :meth:`aclose` having been awaited, anything left in the queue is passed
+    to the wrapped target and draining starts again on the next running
+    event loop an event is logged on. Events logged from other threads are
+    handed to the event loop safely; events logged when there is no event
+    loop to drain them are passed straight to the wrapped target.
+
+    :param target: The target to which events will be passed.
+
+    :param maxsize:
+      The maximum number of events that can be queued, with ``0`` meaning
+      no limit. Events logged while the queue is full are counted in
+      :attr:`dropped` and discarded.
+
+    :param executor:
+      The :class:`concurrent.futures.Executor` in which the wrapped target
+      will be called. If not specified, the event loop's default executor
+      will be used.
+    """
+
+    error_target = None
+
+    def __init__(self, target, maxsize=0, executor=None):
+        self.target = target
+        self.maxsize = maxsize
+        self.executor = executor
+        #: The number of events that have been discarded because the queue
+        #: was full.
+        self.dropped = 0
+        self.events = deque()
+        self.loop = self.task = self.thread = None
+        self.waiter = None
+        self.flushers = []
+        self.busy = self.closed = False
+
+    def start(self, loop=None):
+        """
+        Start draining the queue on the supplied event loop or, if none is
+        supplied, the current event loop.
+        """
+        if loop is None:
+            loop = asyncio.get_event_loop()
+        self.loop = loop
+        self.task = loop.create_task(self._drain())
+
+    def __call__(self, event):
+        task = self.task
+        if task is not None and (task.done() or self.loop.is_closed()):
+            # the event loop we were draining on has gone away, such as
+            # when asyncio.run() returns without aclose() being awaited:
+            self._reset()
+        if self.task is None:
+            loop = None
+            if not self.closed:
+                try:
+                    loop = get_running_loop()
+                except RuntimeError:
+                    pass
+            if loop is None:
+                self._handle([event])
+                return
+            self.start(loop)
+            self.thread = get_ident()
+        if self.thread is not None and self.thread != get_ident():
+            self.loop.call_soon_threadsafe(self._put, event)
+        else:
+            self._put(event)
+
+    def _reset(self):
+        self.task = self.loop = self.thread = self.waiter = None
+        self.busy = False
+        events = list(self.events)
+        self.events.clear()
+        self._handle(events)
+
+    def _put(self, event):
+        if self.maxsize and len(self.events) >= self.maxsize:
+            self.dropped += 1
+            return
+        self.events.append(event)
+        self._wake()
+
+    def _wake(self):
+        waiter = self.waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def _handle(self, events):
+        for event in events:
+            try:
+                self.target(event)
+            except Exception:
+                handle_error(self.error_target, exc_info(), event)
+
+    async def _drain(self):
+        self.thread = get_ident()
+        loop = self.loop
+        events = self.events
+        while True:
+            if not events:
+                for flusher in self.flushers:
+                    if not flusher.done():
+                        flusher.set_result(None)
+                self.flushers = []
+                self.waiter = loop.create_future()
+                await self.waiter
+                self.waiter = None
+                continue
+            batch = list(events)
+            events.clear()
+            self.busy = True
+            try:
+                await loop.run_in_executor(self.executor, self._handle, batch)
+            finally:
+                self.busy = False
+
+    async def _call(self, name):
+        method = getattr(self.target, name, None)
+        if method is not None:
+            await get_running_loop().run_in_executor(
+                self.executor, method
+            )
+
+    async def flush(self):
+        """
+        Wait until all queued events have been passed to the wrapped target
+        and then, if it has one, call its ``flush`` method.
+        """
+        if self.task is not None and (self.events or self.busy):
+            flusher = self.loop.create_future()
+            self.flushers.append(flusher)
+            await flusher
+        await self._call('flush')
+
+    async def aclose(self):
+        """
+        Flush all queued events, stop draining the queue and then, if it
+        has one, call the wrapped target's ``close`` method.
+        Events logged after this are passed straight to the wrapped target.
+        """
+        await self.flush()
+        task = self.task
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self.task = self.loop = self.thread = None
+        self.closed = True
+        await self._call('close')
@@ -0,0 +1,155 @@
+from collections import deque
+from sys import exc_info
+from threading import Condition, Thread
+import atexit
+
+from .compose import handle_error
+
+#: Block the logging thread until there is space in the queue.
+BLOCK = 'block'
+#: Discard the oldest queued event to make space for the new one.
+DROP_OLDEST = 'drop_oldest'
+#: Discard the new event.
+DROP_NEWEST = 'drop_newest'
+
+POLICIES = (BLOCK, DROP_OLDEST, DROP_NEWEST)
+
+
+class QueueTarget(object):
+    """
+    A target that passes events to another target, such as a
+    :class:`~shoehorn.targets.serialize.Serializer` or a
+    :class:`~shoehorn.targets.compose.Stack`, on a worker thread so that
+    the thread doing the logging never waits for serialization or I/O.
+
+    :param target: The target to which events will be passed.
+
+    :param maxsize: The maximum number of events that can be queued.
+
+    :param policy:
+      What to do when the queue is full, one of :data:`BLOCK`,
+      :data:`DROP_OLDEST` or :data:`DROP_NEWEST`.
+
+    :param flush_at_exit:
+      If ``True``, the queue will be flushed and the worker stopped
+      when the interpreter exits.
+    """
+
+    error_target = None
+
+    def __init__(self, target, maxsize=10000, policy=BLOCK,
+                 flush_at_exit=True):
+        assert policy in POLICIES, \
+            'policy must be one of: '+', '.join(POLICIES)
+        self.target = target
+        self.maxsize = maxsize
+        self.policy = policy
+        #: The number of events that have been discarded because the queue
+        #: was full.
+        self.dropped = 0
+        self.events = deque()
+        self.pending = 0
+        self.closed = False
+        self.running = True
+        self.condition = Condition()
+        self.thread = Thread(target=self._run, name='shoehorn-queue')
+        self.thread.daemon = True
+        self.thread.start()
+        self.flush_at_exit = flush_at_exit
+        if flush_at_exit:
+            atexit.register(self.close)
+
+    def __call__(self, event):
+        with self.condition:
+            events = self.events
+            if not self.running or not self.thread.is_alive():
+                # there's no worker to hand off to:
+                pass
+            elif len(events) >= self.maxsize and not self.closed:
+                if self.policy == DROP_NEWEST:
+                    self.dropped += 1
+                    return
+                elif self.policy == DROP_OLDEST:
+                    events.popleft()
+                    self.pending -= 1
+                    self.dropped += 1
+                else:
+                    while (len(events) >= self.maxsize and not self.closed
+                           and self.running):
+                        self.condition.wait()
+            if not self.closed and self.running:
+                events.append(event)
+                self.pending += 1
+                self.condition.notify_all()
+                return
+        # nothing left to hand off to, so do the work ourselves:
+        self._handle(event)
+
+    def _handle(self, event):
+        try:
+            self.target(event)
+        except Exception:
+            handle_error(self.error_target, exc_info(), event)
+
+    def _run(self):
+        try:
+            self._drain()
+        finally:
+            # make sure loggers never wait on a worker that has gone away:
+            with self.condition:
+                self.running = False
+                self.condition.notify_all()
+
+    def _drain(self):
+        condition = self.condition
+        events = self.events
+        while True:
+            with condition:
+                while not events and not self.closed:
+                    condition.wait()
+                if not events:
+                    return
+                batch = list(events)
+                events.clear()
+                # there's now space for blocked loggers:
+                condition.notify_all()
+            try:
+                for event in batch:
+                    try:
+                        self._handle(event)
+                    except Exception:
+                        # the error target failed, and there's nowhere left
+                        # to report that, but the worker must carry on:
+                        pass
+            finally:
+                with condition:
+                    self.pending -= len(batch)
+                    if not self.pending:
+                        condition.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Wait until all queued events have been passed to the target.
+        Returns ``True`` if this happened before the timeout, which is
+        specified in seconds, expired.
+        """
+        with self.condition:
+            while self.pending and self.running:
+                if not self.condition.wait(timeout) and timeout is not None:
+                    break
+            return not self.pending
+
+    def close(self, timeout=None):
+        """
+        Pass all queued events to the target and stop the worker thread.
+        Events logged after this will be passed to the target on the
+        thread doing the logging.
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join(timeout)
+        if self.flush_at_exit:
+            unregister = getattr(atexit, 'unregister', None)
+            if unregister is not None:
+                unregister(self.close)
@@ -0,0 +1,241 @@
+"""
+A compact binary log format, along with a serializer to write it and a
+reader that turns it back into :class:`~shoehorn.event.Event` instances,
+which can then be passed to any other serializer.
+
+The format is a sequence of records, each made up of a one byte record
+type, the length of the payload as a varint and then the payload itself:
+
+- A reset record, containing :data:`MAGIC`, starts a new table of keys.
+  One is written whenever a :class:`Binary` serializer starts writing.
+
+- A key record contains a key encoded as UTF-8, and adds it to the table
+  of keys so that events only need to refer to it by its position.
+
+- An event record contains a varint giving the position of each key in the
+  table followed by its type-tagged value.
+"""
+from struct import Struct
+
+from ..compat import PY2, Unicode
+from ..event import Event
+from .serialize import BinarySerializer
+
+#: The contents of the record that starts each table of keys.
+MAGIC = b'shoehorn/1'
+
+RESET, KEY, EVENT = b'R', b'K', b'E'
+
+NONE, TRUE, FALSE, INT, FLOAT, TEXT, BYTES, LIST, TUPLE, MAPPING = (
+    b'N', b'T', b'F', b'I', b'D', b'S', b'B', b'L', b'U', b'M'
+)
+
+double = Struct('<d')
+
+if PY2:  # pragma: no cover
+    integer_types = (int, long)
+else:
+    integer_types = (int, )
+
+
+def encode_varint(value, buffer):
+    while value >= 0x80:
+        buffer.append((value & 0x7f) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def encode_text(value, buffer):
+    data = value.encode('utf-8', 'backslashreplace')
+    encode_varint(len(data), buffer)
+    buffer += data
+
+
+def encode_value(value, buffer):
+    """
+    Append the type-tagged encoding of the supplied value to the buffer.
+    Values of types that can't be represented are encoded as text using
+    :class:`str`.
+    """
+    if value is None:
+        buffer += NONE
+    elif value is True:
+        buffer += TRUE
+    elif value is False:
+        buffer += FALSE
+    elif isinstance(value, integer_types):
+        buffer += INT
+        # zigzag encoding so small negative numbers stay small:
+        encode_varint(value << 1 if value >= 0 else (-value << 1) - 1,
+                      buffer)
+    elif isinstance(value, float):
+        buffer += FLOAT
+        buffer += double.pack(value)
+    elif isinstance(value, Unicode):
+        buffer += TEXT
+        encode_text(value, buffer)
+    elif isinstance(value, bytes):
+        buffer += BYTES
+        encode_varint(len(value), buffer)
+        buffer += value
+    elif isinstance(value, (list, tuple)):
+        buffer += LIST if isinstance(value, list) else TUPLE
+        encode_varint(len(value), buffer)
+        for item in value:
+            encode_value(item, buffer)
+    elif isinstance(value, dict):
+        buffer += MAPPING
+        encode_varint(len(value), buffer)
+        for key, item in value.items():
+            encode_text(Unicode(key), buffer)
+            encode_value(item, buffer)
+    else:
+        buffer += TEXT
+        encode_text(Unicode(value), buffer)
+
+
+class Binary(BinarySerializer):
+    """
+    A serializer that writes events in the compact binary format described
+    in :mod:`shoehorn.targets.binary`. Use :func:`read` to turn the
+    binary data back into events.
+    """
+
+    terminator = b''
+
+    def __init__(self, stream, **kw):
+        super(Binary, self).__init__(stream, **kw)
+        self.keys = None
+
+    def __call__(self, event):
+        # keys must be written in the order in which they are numbered:
+        with self.lock:
+            try:
+                super(Binary, self).__call__(event)
+            except Exception:
+                # the key records this event needed may not have been
+                # written, so start a new table of keys with the next one:
+                self.keys = None
+                raise
+
+    def render_event(self, event):
+        buffer = bytearray()
+        keys = self.keys
+        if keys is None:
+            keys = self.keys = {}
+            self._record(RESET, MAGIC, buffer)
+        payload = bytearray()
+        for key, value in event.items():
+            index = keys.get(key)
+            if index is None:
+                index = keys[key] = len(keys)
+                self._record(KEY, Unicode(key).encode('utf-8'), buffer)
+            encode_varint(index, payload)
+            encode_value(value, payload)
+        self._record(EVENT, payload, buffer)
+        return bytes(buffer)
+
+    @staticmethod
+    def _record(type_, payload, buffer):
+        buffer += type_
+        encode_varint(len(payload), buffer)
+        buffer += payload
+
+
+class Reader(object):
+
+    def __init__(self, data):
+        self.data = data
+        self.position = 0
+
+    def varint(self):
+        data = self.data
+        result = shift = 0
+        while True:
+            value = data[self.position]
+            self.position += 1
+            result |= (value & 0x7f) << shift
+            if not value & 0x80:
+                return result
+            shift += 7
+
+    def take(self, length):
+        start = self.position
+        self.position += length
+        return self.data[start:self.position]
+
+    def text(self):
+        return self.take(self.varint()).decode('utf-8')
+
+    def value(self):
+        tag = self.take(1)
+        if tag == NONE:
+            return None
+        elif tag == TRUE:
+            return True
+        elif tag == FALSE:
+            return False
+        elif tag == INT:
+            value = self.varint()
+            return -((value + 1) >> 1) if value & 1 else value >> 1
+        elif tag == FLOAT:
+            return double.unpack(self.take(8))[0]
+        elif tag == TEXT:
+            return self.text()
+        elif tag == BYTES:
+            return bytes(self.take(self.varint()))
+        elif tag in (LIST, TUPLE):
+            items = [self.value() for i in range(self.varint())]
+            return items if tag == LIST else tuple(items)
+        elif tag == MAPPING:
+            return Event((self.text(), self.value())
+                         for i in range(self.varint()))
+        raise ValueError('unknown value type: {!r}'.format(tag))
+
+
+def read_varint(stream):
+    result = shift = 0
+    while True:
+        data = stream.read(1)
+        if not data:
+            return None
+        value = ord(data)
+        result |= (value & 0x7f) << shift
+        if not value & 0x80:
+            return result
+        shift += 7
+
+
+def read(stream):
+    """
+    Read the binary format written by :class:`Binary` from the supplied
+    binary stream, yielding an :class:`~shoehorn.event.Event` for each event
+    found. Reading stops at the end of the stream or at a partially
+    written record.
+    """
+    keys = None
+    while True:
+        type_ = stream.read(1)
+        length = read_varint(stream)
+        if length is None:
+            return
+        payload = stream.read(length)
+        if len(payload) < length:
+            return
+        if type_ == RESET:
+            if payload != MAGIC:
+                raise ValueError('unknown format: {!r}'.format(payload))
+            keys = []
+        elif keys is None:
+            raise ValueError('no reset record at start of stream')
+        elif type_ == KEY:
+            keys.append(payload.decode('utf-8'))
+        elif type_ == EVENT:
+            reader = Reader(bytearray(payload))
+            event = Event()
+            while reader.position < length:
+                index = reader.varint()
+                if index >= len(keys):
+                    raise ValueError('unknown key: {}'.format(index))
+                event[keys[index]] = reader.value()
+            yield event
@@ -1,6 +1,7 @@
-from collections import deque
 from sys import exc_info
+from threading import RLock
 
+from ..compat import MutableMapping
 from ..event import Event
 
 MARKER = object()
@@ -14,32 +15,113 @@ def handle_error(target, exc_info, event):
         )))
 
 
+def copy_event(event):
+    """
+    Return a shallow copy of the supplied event, if it is a mapping.
+    """
+    if isinstance(event, MutableMapping):
+        return Event(event)
+    return event
+
+
+def compile_stack(stack):
+    """
+    Return a function that passes an event through the current targets of
+    the supplied :class:`Stack` in the same way as :meth:`Stack.__call__`,
+    but as straight-line code specialised for those targets.
+    """
+    namespace = dict(stack=stack, handle_error=handle_error,
+                     exc_info=exc_info)
+    lines = ['def call(event):', '    try:']
+    targets = list(stack.targets)
+    for i, target in enumerate(targets):
+        name = 'target%i' % i
+        namespace[name] = target
+        if i == len(targets) - 1:
+            lines.append('        %s(event)' % name)
+        else:
+            lines.extend((
+                '        result = %s(event)' % name,
+                '        if not result:',
+                '            return',
+                '        if result is not True:',
+                '            event = result',
+            ))
+    if not targets:
+        lines.append('        pass')
+    lines.extend((
+        '    except:',
+        '        handle_error(stack.error_target, exc_info(), event)',
+    ))
+    exec('\n'.join(lines), namespace)
+    return namespace['call']
+
+
 class Stack(object):
+    """
+    A target that passes each event through a sequence of targets in turn.
+    If a target returns something false, the event goes no further;
+    ``True`` passes the event on unchanged and anything else is passed on
+    in place of the event.
+
+    :param targets: The initial targets, as would be passed to :meth:`push`.
+
+    :param error_target:
+      The target to pass information about errors to, which will also be
+      set on any pushed target with an ``error_target`` of ``None``.
+
+    :param compiled:
+      If ``True``, the targets are compiled into a single function whenever
+      they change, see :func:`compile_stack`.
+
+    The targets are held in a tuple that :meth:`push` and :meth:`pop`
+    replace rather than modify, so events being handled on other threads
+    never need a lock and see either the old targets or the new ones.
+    """
+
+    compiled_call = None
 
     def __init__(self, *targets, **kw):
         error_target = kw.pop('error_target', None)
-        assert not kw, 'only error_target is a keyword parameter'
-        self.targets = deque()
+        compiled = kw.pop('compiled', False)
+        assert not kw, 'only error_target and compiled are keyword parameters'
+        self.targets = ()
         self.error_target = error_target
         self.error_target_installed = []
+        self.compiled = compiled
+        self.lock = RLock()
         self.push(*targets)
 
+    def _targets_changed(self):
+        if self.compiled:
+            self.compiled_call = compile_stack(self)
+
     def push(self, *targets):
-        self.targets.extendleft(reversed(targets))
-        if self.error_target is not None:
-            for target in targets:
-                if getattr(target, 'error_target', MARKER) is None:
-                    target.error_target = self.error_target
-                    self.error_target_installed.append(target)
+        with self.lock:
+            if self.error_target is not None:
+                for target in targets:
+                    if getattr(target, 'error_target', MARKER) is None:
+                        target.error_target = self.error_target
+                        self.error_target_installed.append(target)
+            self.targets = targets + tuple(self.targets)
+            self._targets_changed()
 
     def pop(self):
-        target = self.targets.popleft()
-        if target in self.error_target_installed:
-            target.error_target = None
-            self.error_target_installed.remove(target)
+        with self.lock:
+            targets = tuple(self.targets)
+            target = targets[0]
+            self.targets = targets[1:]
+            if target in self.error_target_installed:
+                target.error_target = None
+                self.error_target_installed.remove(target)
+            self._targets_changed()
         return target
 
     def __call__(self, event):
+        compiled_call = self.compiled_call
+        if compiled_call is not None:
+            compiled_call(event)
+            return
         try:
             for target in self.targets:
                 result = target(event)
@@ -52,25 +134,71 @@ class Stack(object):
 
 
 class Layer(object):
+    """
+    A target that passes each event to all of its targets, with an error
+    in one target not stopping the event being passed to the others.
+
+    :param propagate:
+      If ``True``, the event is returned so that it carries on down any
+      :class:`Stack` this layer is part of.
+
+    :param error_target: The target to pass information about errors to.
+
+    :param executor:
+      A :class:`concurrent.futures.Executor`, such as a
+      :class:`~concurrent.futures.ThreadPoolExecutor`, used to pass the event
+      to the targets in parallel, with each target being passed its own
+      shallow copy of the event. If not specified, the targets are called
+      one after another.
+
+    :param wait:
+      When an executor is used, ``True`` means the layer waits for all
+      targets to finish with the event. ``False`` means it returns
+      immediately, so targets may still be handling the event while it
+      carries on down a :class:`Stack`.
+    """
 
     def __init__(self, *targets, **kw):
         propagate = kw.pop('propagate', False)
         error_target = kw.pop('error_target', None)
-        assert not kw, 'only propagate and error_target are keyword parameters'
-        
-        self.targets = []
-        self.targets.extend(targets)
+        executor = kw.pop('executor', None)
+        wait = kw.pop('wait', True)
+        assert not kw, ('only propagate, error_target, executor and wait '
+                        'are keyword parameters')
+
+        self.targets = targets
         self.propagate = propagate
         self.error_target = error_target
+        self.executor = executor
+        self.wait = wait
+        self.lock = RLock()
 
     def add(self, target):
-        self.targets.append(target)
+        # replace rather than modify so events being handled on other
+        # threads are unaffected:
+        with self.lock:
+            self.targets = self.targets + (target, )
+
+    def _call_target(self, target, event):
+        try:
+            target(event)
+        except Exception:
+            handle_error(self.error_target, exc_info(), event)
 
     def __call__(self, event):
-        for target in self.targets:
-            try:
-                target(event)
-            except Exception as exception:
-                handle_error(self.error_target, exc_info(), event)
+        executor = self.executor
+        if executor is None:
+            for target in self.targets:
+                self._call_target(target, event)
+        else:
+            # each target gets its own copy so that targets modifying the
+            # event don't interfere with each other or with the targets
+            # further down the stack:
+            futures = [executor.submit(self._call_target, target,
+                                       copy_event(event))
+                       for target in self.targets]
+            if self.wait:
+                for future in futures:
+                    future.result()
         if self.propagate:
             return event
@@ -1,5 +1,9 @@
+from collections import OrderedDict
 from datetime import datetime, tzinfo, timedelta
-from traceback import format_exception, format_stack
+from threading import Lock
+from time import time
+from traceback import format_exception, format_exception_only, format_stack
+import re
 import sys
 
 from ..compat import PY3
@@ -15,11 +19,29 @@ class UTC(tzinfo):
         return timedelta(0)
 
 
+def split_format(format):
+    """
+    Split a :meth:`~datetime.datetime.strftime` format string at each
+    ``%f`` directive.
+    """
+    segments = []
+    current = ''
+    for part in re.split('(?s)(%.)', format):
+        if part == '%f':
+            segments.append(current)
+            current = ''
+        else:
+            current += part
+    segments.append(current)
+    return segments
+
+
 class Timestamp(object):
 
     tz = None
 
-    def __init__(self, key='timestamp', tz=None, format=None):
+    def __init__(self, key='timestamp', tz=None, format=None, cached=False,
+                 raw=False):
         """
         :param key: string specifying the key to add to the event
 
@@ -28,22 +50,80 @@ class Timestamp(object):
           :class:`~datetime.tzinfo` instance.
           If not specified, the timestamp will be added in the local time with
           no timezone.
+
+        :param format:
+          A :meth:`~datetime.datetime.strftime` format string to use instead
+          of :meth:`~datetime.datetime.isoformat`.
+
+        :param cached:
+          If ``True``, the part of the timestamp down to the second is only
+          formatted once each second, with just the microseconds
+          formatted for each event.
+
+        :param raw:
+          If ``True``, the timestamp is added as the float returned by
+          :func:`time.time`, leaving any formatting to whatever
+          serializes the event, such as a
+          :class:`~shoehorn.targets.serialize.Serializer` with the key in
+          its `timestamp_keys`.
         """
+        assert not (raw and (tz or format or cached)), \
+            'raw timestamps cannot have a timezone, format or be cached'
         self.key = key
         self.tz = tz
         self.format = format
+        self.cached = cached
+        self.raw = raw
+        self.segments = None if format is None else split_format(format)
+        self.cache = None, None
 
     def __call__(self, event):
-        now = datetime.now(self.tz)
-        if self.format is None:
-            timestamp = now.isoformat()
+        if self.raw:
+            event[self.key] = time()
+            return event
+        if self.cached:
+            timestamp = self.render(time())
         else:
-            timestamp = now.strftime(self.format)
+            now = datetime.now(self.tz)
+            if self.format is None:
+                timestamp = now.isoformat()
+            else:
+                timestamp = now.strftime(self.format)
         event[self.key] = timestamp
         return event
 
-
-def traceback(event):
+    def render(self, now):
+        """
+        Return the formatted timestamp for the supplied number of seconds
+        since the epoch, as returned by :func:`time.time`, formatting the
+        part down to the second only once for each second.
+        """
+        second = int(now // 1)
+        cached_second, parts = self.cache
+        if second != cached_second:
+            moment = datetime.fromtimestamp(second, self.tz)
+            if self.segments is None:
+                naive = moment.replace(tzinfo=None).isoformat()
+                parts = naive, moment.isoformat()[len(naive):]
+            else:
+                parts = tuple(moment.strftime(segment)
+                              for segment in self.segments)
+            self.cache = second, parts
+        microsecond = min(int(round((now - second) * 1e6)), 999999)
+        if self.segments is None:
+            # isoformat leaves out microseconds when there are none:
+            if microsecond:
+                return parts[0]+'.%06d' % microsecond+parts[1]
+            return parts[0]+parts[1]
+        return ('%06d' % microsecond).join(parts)
+
+
+def exception_info(event):
+    """
+    Remove the ``exception`` and ``exc_info`` keys from the event and, if a
+    traceback is wanted, return the ``(type, value, traceback)`` for it.
+    A type of ``None`` means the current stack should be used.
+    """
     type_ = None
     value = event.pop('exception', None)
     tb = None
@@ -56,20 +136,28 @@ def traceback(event):
         value = ei_value if value is None else value
         wants_tb = True
 
-    if value is not None or wants_tb:
+    if value is None and not wants_tb:
+        return None
+
+    if isinstance(value, BaseException):
+        type_, value = type(value), value
+        if PY3:
+            tb = value.__traceback__
 
-        if isinstance(value, BaseException):
-            type_, value = type(value), value
-            if PY3:
-                tb = value.__traceback__
+    if wants_tb and not all((type_, value, tb)):
+        # primarily because python 2's exceptions have no __traceback__
+        ei_type, ei_value, ei_tb = sys.exc_info()
+        type_ = ei_type if type_ is None else type_
+        value = ei_value if value is None else value
+        tb = ei_tb if tb is None else tb
+
+    return type_, value, tb
 
-        if wants_tb and not all((type_, value, tb)):
-            # primarily because python 2's exceptions have no __traceback__
-            ei_type, ei_value, ei_tb = sys.exc_info()
-            type_ = ei_type if type_ is None else type_
-            value = ei_value if value is None else value
-            tb = ei_tb if tb is None else tb
 
+def traceback(event):
+    info = exception_info(event)
+    if info is not None:
+        type_, value, tb = info
         if type_ is None:
             parts = format_stack()
         else:
@@ -78,3 +166,80 @@ def traceback(event):
         event['traceback'] = ''.join(parts).strip('\n')
 
     return event
+
+
+def fingerprint(type_, value, tb, seen=None):
+    """
+    Return a hashable that identifies the formatted text of the supplied
+    exception, made up of its type, message and the code, line number and
+    instruction of each frame of its traceback, along with those of any
+    exceptions chained to it. The instruction is needed as the formatted
+    text may point at the part of the line that failed.
+    """
+    frames = []
+    while tb is not None:
+        frames.append((tb.tb_frame.f_code, tb.tb_lineno, tb.tb_lasti))
+        tb = tb.tb_next
+    key = [type_, tuple(format_exception_only(type_, value)), tuple(frames)]
+    if PY3 and isinstance(value, BaseException):
+        if seen is None:
+            seen = set()
+        seen.add(id(value))
+        for chained in value.__cause__, value.__context__:
+            if chained is not None and id(chained) not in seen:
+                key.append((value.__suppress_context__, fingerprint(
+                    type(chained), chained, chained.__traceback__, seen
+                )))
+            else:
+                key.append(None)
+    return tuple(key)
+
+
+class CachedTraceback(object):
+    """
+    An enricher that adds a traceback to events in the same way as
+    :func:`traceback`, but which only formats each distinct traceback once,
+    as identified by its :func:`fingerprint`.
+
+    :param maxsize:
+      The maximum number of formatted tracebacks to keep, with the least
+      recently used being discarded first.
+    """
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.lock = Lock()
+
+    def __call__(self, event):
+        info = exception_info(event)
+        if info is not None:
+            event['traceback'] = self.format(*info)
+        return event
+
+    def format(self, type_, value, tb):
+        if type_ is None:
+            key = []
+            frame = sys._getframe()
+            while frame is not None:
+                key.append((frame.f_code, frame.f_lineno, frame.f_lasti))
+                frame = frame.f_back
+            key = tuple(key)
+        else:
+            key = fingerprint(type_, value, tb)
+        cache = self.cache
+        with self.lock:
+            text = cache.pop(key, None)
+            if text is not None:
+                cache[key] = text
+                return text
+        if type_ is None:
+            parts = format_stack()
+        else:
+            parts = format_exception(type_, value, tb)
+        text = ''.join(parts).strip('\n')
+        with self.lock:
+            cache[key] = text
+            while len(cache) > self.maxsize:
+                cache.popitem(last=False)
+        return text
@@ -1,6 +1,7 @@
 import re
 
-from shoehorn.event import Event
+from shoehorn.compat import text_types
+from shoehorn.levels import level_number
 
 
 class RemoveKeys(object):
@@ -15,10 +16,210 @@ class RemoveKeys(object):
 
 
 class RemoveKeysByPattern(object):
+    """
+    Remove keys matching the supplied regular expression from events.
 
-    def __init__(self, pattern):
+    Whether a key matches is remembered for up to `maxsize` distinct keys,
+    so events with no matching keys are passed on unchanged for the cost of
+    a dictionary lookup per key.
+    """
+
+    def __init__(self, pattern, maxsize=1000):
         self.pattern = re.compile(pattern)
+        self.maxsize = maxsize
+        self.decisions = {}
 
     def __call__(self, event):
-        return Event((k, v) for (k, v) in event.items()
-                     if not self.pattern.match(k))
+        decisions = self.decisions
+        remove = None
+        for key in event:
+            decision = decisions.get(key)
+            if decision is None:
+                decision = self.pattern.match(key) is not None
+                if len(decisions) < self.maxsize:
+                    decisions[key] = decision
+            if decision:
+                if remove is None:
+                    remove = [key]
+                else:
+                    remove.append(key)
+        if remove is not None:
+            for key in remove:
+                del event[key]
+        return event
+
+
+class Rule(object):
+    """
+    The base class for rules that can be compiled into a filter using
+    :func:`compile_filter`. Rules can be combined using ``&``, ``|`` and
+    ``~``.
+    """
+
+    def __and__(self, other):
+        return All(self, other)
+
+    def __or__(self, other):
+        return Any(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+    def source(self, namespace):
+        """
+        Return a Python expression that is true when an event matches this
+        rule. The expression can use ``event``, its ``get`` method and any
+        names added to the supplied `namespace`.
+        """
+        raise NotImplementedError()
+
+    @staticmethod
+    def name(namespace, value):
+        name = '_%i' % len(namespace)
+        namespace[name] = value
+        return name
+
+
+class Level(Rule):
+    """
+    Matches events with a level at or above the one supplied, which may be
+    a name or a number. Events with no level or an unknown level do not
+    match.
+    """
+
+    def __init__(self, level):
+        self.level = level_number(level)
+        assert self.level is not None, 'unknown level: {!r}'.format(level)
+
+    def source(self, namespace):
+        return "level_number(get('level'), -1) >= %i" % self.level
+
+
+class Has(Rule):
+    """
+    Matches events containing the supplied key.
+    """
+
+    def __init__(self, key):
+        self.key = key
+
+    def source(self, namespace):
+        return '%s in event' % self.name(namespace, self.key)
+
+
+class Equal(Rule):
+    """
+    Matches events where the value for the supplied key is equal to the
+    supplied value.
+    """
+
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+
+    def source(self, namespace):
+        return 'get(%s, missing) == %s' % (self.name(namespace, self.key),
+                                           self.name(namespace, self.value))
+
+
+class In(Rule):
+    """
+    Matches events where the value for the supplied key is one of the
+    supplied values, all of which must be hashable.
+    """
+
+    def __init__(self, key, values):
+        self.key = key
+        self.values = frozenset(values)
+        self.sequence = tuple(self.values)
+
+    def contains(self, value):
+        try:
+            return value in self.values
+        except TypeError:
+            # unhashable values, such as lists, need a linear search:
+            return value in self.sequence
+
+    def source(self, namespace):
+        return '%s(get(%s, missing))' % (self.name(namespace, self.contains),
+                                         self.name(namespace, self.key))
+
+
+class Match(Rule):
+    """
+    Matches events where the value for the supplied key is text that the
+    supplied regular expression can be found in.
+    """
+
+    def __init__(self, key, pattern):
+        self.key = key
+        self.search = re.compile(pattern).search
+
+    def matches(self, value):
+        return isinstance(value, text_types) and self.search(value) is not None
+
+    def source(self, namespace):
+        return '%s(get(%s))' % (self.name(namespace, self.matches),
+                                self.name(namespace, self.key))
+
+
+class All(Rule):
+    """
+    Matches events that match all of the supplied rules.
+    """
+
+    def __init__(self, *rules):
+        self.rules = rules
+
+    def source(self, namespace):
+        if not self.rules:
+            return 'True'
+        return '(' + ' and '.join(rule.source(namespace)
+                                  for rule in self.rules) + ')'
+
+
+class Any(Rule):
+    """
+    Matches events that match any of the supplied rules.
+    """
+
+    def __init__(self, *rules):
+        self.rules = rules
+
+    def source(self, namespace):
+        if not self.rules:
+            return 'False'
+        return '(' + ' or '.join(rule.source(namespace)
+                                 for rule in self.rules) + ')'
+
+
+class Not(Rule):
+    """
+    Matches events that do not match the supplied rule.
+    """
+
+    def __init__(self, rule):
+        self.rule = rule
+
+    def source(self, namespace):
+        return '(not %s)' % self.rule.source(namespace)
+
+
+def compile_filter(*rules):
+    """
+    Return a target that passes on only those events matching all of the
+    supplied :class:`Rule` instances, compiled into a single function so
+    that events can be dropped before any further work is done on them.
+    The source of the function is available as its ``source`` attribute.
+    """
+    namespace = dict(level_number=level_number, missing=object())
+    source = '\n'.join((
+        'def filter(event):',
+        '    get = event.get',
+        '    if %s:' % All(*rules).source(namespace),
+        '        return event',
+    ))
+    exec(source, namespace)
+    function = namespace['filter']
+    function.source = source
+    return function
@@ -0,0 +1,315 @@
+"""
+Targets that reduce the number of events passed on down a
+:class:`~shoehorn.targets.compose.Stack` when more are being logged than
+can be handled.
+"""
+from random import random
+from threading import Lock, Timer
+from zlib import crc32
+import time
+
+from ..compat import OrderedDict, Unicode
+from ..event import Event
+
+clock = getattr(time, 'monotonic', time.time)
+
+
+class Limiter(object):
+    """
+    The base class for targets that suppress events, keeping cheap counts
+    of the events suppressed and periodically passing an event summarising
+    them to another target.
+
+    :param summary_target:
+      The target to which summary events will be passed, which should not
+      be one that passes events back through this target. If not supplied,
+      no summary events are produced.
+
+    :param interval:
+      The number of seconds after an event is first suppressed that the
+      summary event will be produced.
+    """
+
+    def __init__(self, summary_target=None, interval=60):
+        self.summary_target = summary_target
+        self.interval = interval
+        #: The number of events suppressed since the last summary.
+        self.suppressed = 0
+        self.lock = Lock()
+        self.timer = None
+
+    def suppress(self):
+        with self.lock:
+            self.suppressed += 1
+            if self.timer is None and self.summary_target is not None:
+                self.timer = Timer(self.interval, self.on_timer)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def on_timer(self):
+        self.flush()
+
+    def summary(self, suppressed):
+        """
+        Return the summary event for the supplied number of suppressed
+        events.
+        """
+        return Event((
+            ('level', 'warning'),
+            ('message', 'events suppressed'),
+            ('limiter', type(self).__name__),
+            ('suppressed', suppressed),
+        ))
+
+    def flush(self):
+        """
+        Pass a summary of any events suppressed since the last summary to
+        the summary target now.
+        """
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            suppressed, self.suppressed = self.suppressed, 0
+            summary = self.summary(suppressed) if suppressed else None
+        if summary is not None and self.summary_target is not None:
+            self.summary_target(summary)
+
+    def close(self):
+        self.flush()
+
+
+class Sample(Limiter):
+    """
+    Pass on a random sample of events.
+
+    :param rate: The proportion of events to pass on, from 0 to 1.
+
+    Other parameters are as for :class:`Limiter`.
+    """
+
+    def __init__(self, rate, **kw):
+        super(Sample, self).__init__(**kw)
+        self.rate = rate
+
+    def __call__(self, event):
+        if random() < self.rate:
+            return event
+        self.suppress()
+
+
+class HashSample(Limiter):
+    """
+    Pass on a sample of events chosen by the hash of the value for the
+    supplied key, such that all events with the same value, such as all
+    those for one request, are either passed on or suppressed together.
+    Events without the key are always passed on.
+
+    :param key: The key whose value will be hashed.
+
+    :param rate: The proportion of values to pass on events for, from 0 to 1.
+
+    Other parameters are as for :class:`Limiter`.
+    """
+
+    def __init__(self, key, rate, **kw):
+        super(HashSample, self).__init__(**kw)
+        self.key = key
+        self.rate = rate
+        self.threshold = int(rate * 0x100000000)
+
+    def __call__(self, event):
+        value = event.get(self.key)
+        if value is None:
+            return event
+        if not isinstance(value, bytes):
+            value = Unicode(value).encode('utf-8', 'backslashreplace')
+        if crc32(value) & 0xffffffff < self.threshold:
+            return event
+        self.suppress()
+
+
+class RateLimit(Limiter):
+    """
+    Pass on events at no more than the supplied rate, using a token bucket
+    for each value of the supplied key.
+
+    :param rate: The number of events per second to pass on.
+
+    :param burst:
+      The number of events that can be passed on in a burst above the rate,
+      which defaults to the rate, or 1 if the rate is lower than that.
+
+    :param key:
+      If supplied, events are limited separately for each value of this key,
+      with events without it sharing one limit.
+
+    :param maxsize:
+      The maximum number of token buckets to keep. If there are more values
+      of the key than this, the least recently used bucket is discarded, so
+      that value starts again with a full bucket.
+
+    Other parameters are as for :class:`Limiter`.
+    """
+
+    def __init__(self, rate, burst=None, key=None, maxsize=10000, **kw):
+        super(RateLimit, self).__init__(**kw)
+        self.rate = rate
+        self.burst = max(rate, 1) if burst is None else burst
+        assert self.burst >= 1, 'burst must be at least 1'
+        self.key = key
+        self.maxsize = maxsize
+        #: The token buckets, least recently used first.
+        self.buckets = OrderedDict()
+
+    def __call__(self, event):
+        value = None if self.key is None else event.get(self.key)
+        now = clock()
+        buckets = self.buckets
+        with self.lock:
+            bucket = buckets.pop(value, None)
+            if bucket is None:
+                if len(buckets) >= self.maxsize:
+                    buckets.popitem(last=False)
+                bucket = [self.burst, now]
+            buckets[value] = bucket
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            passed = tokens >= 1
+            bucket[0] = tokens - 1 if passed else tokens
+        if passed:
+            return event
+        self.suppress()
+
+
+missing = object()
+
+
+class Deduplicate(Limiter):
+    """
+    Pass on the first of a burst of events that have the same values for the
+    supplied keys and suppress the repeats that follow within a window of
+    time. When the window closes, an event with the values of those keys
+    and the number of ``repeats`` is passed to the summary target.
+    Here, :attr:`~Limiter.suppressed` is the number of repeats in windows
+    that are still open.
+
+    :param keys: The keys whose values identify repeated events.
+
+    :param window:
+      The number of seconds, from the first event, for which repeats are
+      suppressed.
+
+    :param maxsize:
+      The maximum number of windows to keep open. If more are needed, all
+      open windows are closed.
+
+    :param summary_target:
+      The target to which summary events will be passed, as for
+      :class:`Limiter`.
+    """
+
+    def __init__(self, keys=('level', 'message', 'args'), window=10,
+                 maxsize=10000, summary_target=None):
+        super(Deduplicate, self).__init__(summary_target, window)
+        self.keys = keys
+        self.window = window
+        self.maxsize = maxsize
+        #: The open windows, keyed by the values identifying their events.
+        self.windows = {}
+        #: The clock time at which the timer will close expired windows.
+        self.due = None
+
+    def __call__(self, event):
+        get = event.get
+        values = key = tuple(get(k, missing) for k in self.keys)
+        try:
+            hash(key)
+        except TypeError:
+            key = repr(values)
+        now = clock()
+        windows = self.windows
+        closed = ()
+        with self.lock:
+            entry = windows.get(key)
+            if entry is not None and now - entry[0] < self.window:
+                entry[1] += 1
+                self.suppressed += 1
+                if self.summary_target is not None:
+                    self._schedule(entry[0] + self.window, now)
+                return None
+            if entry is not None:
+                if entry[1]:
+                    closed = [entry]
+                    self.suppressed -= entry[1]
+            elif len(windows) >= self.maxsize:
+                closed = self._close_windows(now, everything=True)
+            windows[key] = [now, 0, values]
+        self.emit(closed)
+        return event
+
+    def repeat_summary(self, entry):
+        """
+        Return the summary event for the supplied closed window.
+        """
+        start, repeats, values = entry
+        summary = Event((k, v) for (k, v) in zip(self.keys, values)
+                        if v is not missing)
+        summary['repeats'] = repeats
+        return summary
+
+    def emit(self, entries):
+        if self.summary_target is not None:
+            for entry in entries:
+                self.summary_target(self.repeat_summary(entry))
+
+    def _schedule(self, due, now):
+        # must be called with the lock held, makes sure the timer will fire
+        # no later than the supplied clock time.
+        if self.timer is not None:
+            if self.due <= due:
+                return
+            self.timer.cancel()
+        self.due = due
+        self.timer = Timer(max(due - now, 0), self.on_timer)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def _close_windows(self, now, everything):
+        # must be called with the lock held, returns the closed windows
+        # with repeats that need summaries emitting.
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        closed = []
+        due = None
+        windows = self.windows
+        for key, entry in list(windows.items()):
+            if everything or now - entry[0] >= self.window:
+                del windows[key]
+                if entry[1]:
+                    closed.append(entry)
+                    self.suppressed -= entry[1]
+            elif entry[1]:
+                expires = entry[0] + self.window
+                if due is None or expires < due:
+                    due = expires
+        if due is not None and self.summary_target is not None:
+            self._schedule(due, now)
+        return closed
+
+    def close_windows(self, everything):
+        now = clock()
+        with self.lock:
+            closed = self._close_windows(now, everything)
+        self.emit(closed)
+
+    def on_timer(self):
+        self.close_windows(everything=False)
+
+    def flush(self):
+        """
+        Close all open windows, passing summaries of any repeats to the
+        summary target now.
+        """
+        self.close_windows(everything=True)
@@ -1,13 +1,24 @@
 from __future__ import print_function
 
+from datetime import date, datetime, time
+from decimal import Decimal
 from io import open
+from json import JSONEncoder
 from os.path import expanduser
+from uuid import UUID
 import os
+from threading import RLock, Timer
+from string import Formatter
 import re
 import sys
+from sys import exc_info
+import atexit
 
 from ..compat import text_types, Unicode, PY2
-from ..event import Event
+from ..event import Event, LazyEvent, render, serialize
+from ..levels import level_number
+from .enrich import Timestamp
+from .compose import handle_error
 try:
     from rapidjson import dumps
 except ImportError:
@@ -22,24 +33,320 @@ STDOUT = safe_stream(sys.stdout)
 STDERR = safe_stream(sys.stderr)
 
 
+class RawStream(object):
+    """
+    A stream that writes directly to a file descriptor using
+    :func:`os.write`, encoding any text itself rather than going through an
+    :class:`io.TextIOWrapper`.
+
+    :param fd: The file descriptor to write to, which will be closed when
+               the stream is closed.
+    """
+
+    #: The most parts passed to a single :func:`os.writev` call.
+    max_parts = 1024
+
+    def __init__(self, fd, encoding='utf-8', errors='backslashreplace'):
+        self.fd = fd
+        self.encoding = encoding
+        self.errors = errors
+
+    def _write(self, data):
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self.fd, view):]
+
+    def _writev(self, data):
+        written = os.writev(self.fd, data)
+        if written < sum(len(part) for part in data):
+            self._write(b''.join(data)[written:])
+
+    def write(self, data):
+        if isinstance(data, text_types):
+            data = data.encode(self.encoding, self.errors)
+        self._write(data)
+
+    def writelines(self, parts):
+        """
+        Write all the supplied text or bytes parts. Where :func:`os.writev`
+        is available, the encoded parts are passed to it as they are rather
+        than being joined together first.
+        """
+        data = [part.encode(self.encoding, self.errors)
+                if isinstance(part, text_types) else part
+                for part in parts]
+        if len(data) == 1:
+            self._write(data[0])
+        elif not hasattr(os, 'writev'):
+            self._write(b''.join(data))
+        else:
+            max_parts = self.max_parts
+            for start in range(0, len(data), max_parts):
+                self._writev(data[start:start+max_parts])
+
+    def flush(self):
+        # nothing is buffered between calls
+        pass
+
+    def close(self):
+        os.close(self.fd)
+
+
+def raw_stream(stream):
+    """
+    Return a :class:`RawStream` writing to a duplicate of the file
+    descriptor used by the supplied stream, such as :data:`sys.stderr`.
+    """
+    return RawStream(os.dup(stream.fileno()))
+
+# stdlib json puts a space after commas, rapidjson does not:
+JSON_SEPARATOR = dumps([0, 0])[1:-1].strip('0')
+
+
 class Serializer(object):
+    """
+    The base class for targets that write a line of text to a stream for
+    each event.
+
+    :param stream:
+      The stream to write to, or the path of a file to append to.
+
+    :param buffer_size:
+      If specified, lines are buffered until at least this many characters
+      are waiting to be written.
+
+    :param flush_interval:
+      If specified, lines are buffered but written no more than this many
+      seconds after the first of them was buffered.
+
+    :param flush_level:
+      When buffering, events at or above this level cause the line and
+      anything already buffered to be written immediately.
+
+    :param flush_at_exit:
+      If ``True`` and lines are being buffered, any still buffered will be
+      written when the interpreter exits.
+
+    :param raw:
+      If ``True`` and a path is specified, the file is written using a
+      :class:`RawStream`. Whenever the stream is a :class:`RawStream`, the
+      text and terminator of each line, or all of the buffered lines, are
+      passed to :meth:`RawStream.writelines` rather than being joined
+      into a single string first.
 
-    def __init__(self, stream):
+    :param timestamp_keys:
+      Keys whose values, if they are floats such as those added by
+      ``Timestamp(raw=True)``, are formatted as timestamps when rendering.
+
+    :param time_format:
+      The :meth:`~datetime.datetime.strftime` format used for timestamps,
+      with :meth:`~datetime.datetime.isoformat` being used if not supplied.
+
+    :param tz:
+      The :class:`~datetime.tzinfo` in which timestamps are formatted, with
+      local time being used if not supplied.
+    """
+
+    #: The text written after each rendered event.
+    terminator = u'\n'
+    empty = u''
+
+    #: A hashable identifying the format and configuration of this
+    #: serializer, used along with its class as the key when caching the
+    #: rendering of context bound to a :class:`~shoehorn.logger.Logger`.
+    #: ``None`` means the whole event is always rendered.
+    format_key = None
+
+    def __init__(self, stream, buffer_size=None, flush_interval=None,
+                 flush_level='error', raw=False, timestamp_keys=(),
+                 time_format=None, tz=None, flush_at_exit=True):
         if isinstance(stream, text_types):
-            stream = open(expanduser(stream), 'a', errors='backslashreplace')
+            path = expanduser(stream)
+            if raw:
+                stream = RawStream(
+                    os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                            0o666)
+                )
+            else:
+                stream = self.open(path)
         self.stream = stream
+        self.raw = isinstance(stream, RawStream)
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.flush_level = level_number(flush_level)
+        self.buffered = buffer_size is not None or flush_interval is not None
+        self.buffer = []
+        self.buffer_length = 0
+        self.lock = RLock()
+        self.timer = None
+        self.timestamp_keys = tuple(timestamp_keys)
+        self.time_format = time_format
+        self.tz = tz
+        self.timestamp = Timestamp(tz=tz, format=time_format, cached=True)
+        self.flush_at_exit = flush_at_exit and self.buffered
+        if self.flush_at_exit:
+            atexit.register(self.flush)
+
+    def open(self, path):
+        return open(path, 'a', errors='backslashreplace')
+
+    def __call__(self, event):
+        self.write(self.render(event), level=event.get('level'))
+
+    def render(self, event):
+        """
+        Return the text for the supplied event, without a terminator.
+
+        Where possible, a :class:`~shoehorn.event.LazyEvent` is rendered
+        using the cached result of :meth:`render_bound` and
+        :meth:`render_values`, otherwise :meth:`render_event` is used.
+        """
+        if self.timestamp_keys:
+            event = self.render_timestamps(event)
+        if self.format_key is not None and isinstance(event, LazyEvent):
+            split = event.split()
+            if split is not None:
+                # subclasses may render differently with the same format:
+                rendered = split[0].rendered((type(self), self.format_key),
+                                             self.render_bound)
+                if rendered is not None:
+                    text = self.render_values(rendered, event)
+                    if text is not None:
+                        return text
+        return self.render_event(event)
+
+    def render_timestamps(self, event):
+        """
+        Return the supplied event, or a copy of it with float values for
+        any of the :attr:`timestamp_keys` formatted as timestamps. The
+        event passed in is never modified.
+        """
+        copy = None
+        for key in self.timestamp_keys:
+            value = event.get(key)
+            if not isinstance(value, float):
+                continue
+            if copy is None:
+                if (isinstance(event, LazyEvent) and event.event is None and
+                        key not in event.context):
+                    # keep the bound context shared so its rendering can
+                    # still be cached:
+                    copy = LazyEvent(event.context, Event(event.values),
+                                     event.bound)
+                else:
+                    copy = Event(event)
+            copy[key] = self.timestamp.render(value)
+        return event if copy is None else copy
+
+    def render_event(self, event):
+        """
+        Return the text for the whole of the supplied event.
+        """
+        raise NotImplementedError()
+
+    def render_bound(self, context):
+        """
+        Return a rendering of the supplied mapping of bound context that
+        :meth:`render_values` can combine with the values logged, or ``None``
+        if this isn't possible.
+        """
+        raise NotImplementedError()
+
+    def render_values(self, rendered, event):
+        """
+        Return the text for the supplied :class:`~shoehorn.event.LazyEvent`
+        given its bound context as rendered by :meth:`render_bound`, such that
+        only the values logged need to be rendered. ``None`` can be returned
+        if the whole event needs to be rendered instead.
+        """
+        raise NotImplementedError()
 
     def close(self):
+        self.flush()
         self.stream.close()
+        if self.flush_at_exit:
+            unregister = getattr(atexit, 'unregister', None)
+            if unregister is not None:
+                unregister(self.flush)
 
-    def write(self, *parts):
-        self.stream.write(u''.join(parts)+'\n')
-        self.stream.flush()
+    def flush(self):
+        """
+        Write any buffered lines and flush the stream.
+        """
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if self.buffer:
+                if self.raw:
+                    self.stream.writelines(self.buffer)
+                else:
+                    self.stream.write(self.empty.join(self.buffer))
+                self.buffer = []
+                self.buffer_length = 0
+            self.stream.flush()
+
+    def _flush_on_timer(self):
+        with self.lock:
+            # flushes since the timer was started will have cleared it:
+            if self.timer is not None:
+                self.flush()
+
+    def write(self, *parts, **kw):
+        if not self.buffered:
+            if self.raw:
+                self.stream.writelines(parts + (self.terminator, ))
+            else:
+                self.stream.write(self.empty.join(parts)+self.terminator)
+                self.stream.flush()
+            return
+        level = level_number(kw.get('level'))
+        with self.lock:
+            text = self.empty.join(parts)+self.terminator
+            self.buffer.append(text)
+            self.buffer_length += len(text)
+            if ((self.buffer_size is not None and
+                 self.buffer_length >= self.buffer_size) or
+                (level is not None and self.flush_level is not None and
+                 level >= self.flush_level)):
+                self.flush()
+            elif self.flush_interval is not None and self.timer is None:
+                self.timer = Timer(self.flush_interval, self._flush_on_timer)
+                self.timer.daemon = True
+                self.timer.start()
 
 
 class JSON(Serializer):
 
-    def __call__(self, event):
+    terminator = u''
+    format_key = ('json', )
+
+    def render_bound(self, context):
+        try:
+            text = dumps(context, default=str)
+        except UnicodeDecodeError:
+            return None
+        if isinstance(text, bytes):
+            text = text.decode('utf8')
+        # leave the object open so values can be added:
+        return text[:-1]
+
+    def render_values(self, rendered, event):
+        try:
+            text = dumps(event.values, default=str)
+        except UnicodeDecodeError:
+            return None
+        if isinstance(text, bytes):
+            text = text.decode('utf8')
+        if rendered == u'{':
+            return text
+        if text == u'{}':
+            return rendered+u'}'
+        return rendered+JSON_SEPARATOR+text[1:]
+
+    def render_event(self, event):
+        if isinstance(event, LazyEvent):
+            event = event.materialize()
         try:
             text = dumps(event, default=str)
         except UnicodeDecodeError:
@@ -65,64 +372,319 @@ class JSON(Serializer):
             text = dumps(safe_event, default=str)
         if isinstance(text, bytes):
             text = text.decode('utf8')
-        self.stream.write(text)
+        return text
+
+
+class BinarySerializer(Serializer):
+    """
+    The base class for serializers that write bytes to a binary stream.
+    When buffering, `buffer_size` is a number of bytes.
+    """
+
+    terminator = b'\n'
+    empty = b''
+
+    def open(self, path):
+        return open(path, 'ab')
+
+
+def isoformat(value):
+    return value.isoformat()
+
+
+#: The default mapping of types to the functions :class:`BinaryJSON` uses
+#: to encode their instances. Subclasses of these types use the same
+#: function unless they have their own entry.
+ENCODERS = {
+    date: isoformat,
+    datetime: isoformat,
+    time: isoformat,
+    Decimal: str,
+    UUID: str,
+    bytes: repr,
+    BaseException: repr,
+}
+
+
+class BinaryJSON(BinarySerializer):
+    """
+    A serializer that writes each event as a line of JSON to a binary
+    stream.
+
+    Values that JSON can't represent are converted using the function
+    found for their type in `encoders`, which are used in addition to
+    :data:`ENCODERS`. The lookup is done once per type and then cached.
+    Types with no encoder are converted using :class:`str`.
+    """
+
+    def __init__(self, stream, encoders=None, **kw):
+        super(BinaryJSON, self).__init__(stream, **kw)
+        self.encoders = dict(ENCODERS)
+        if encoders:
+            self.encoders.update(encoders)
+        self.resolved = {}
+        self.encode = JSONEncoder(default=self.default,
+                                  separators=(',', ':')).encode
+        self.format_key = ('binary_json',
+                           frozenset(self.encoders.items()))
+
+    def encoder_for(self, type_):
+        """
+        Return the function used to encode instances of the supplied type.
+        """
+        try:
+            return self.resolved[type_]
+        except KeyError:
+            encoders = self.encoders
+            for base in type_.__mro__:
+                encoder = encoders.get(base)
+                if encoder is not None:
+                    break
+            else:
+                encoder = str
+            self.resolved[type_] = encoder
+            return encoder
+
+    def default(self, value):
+        return self.encoder_for(type(value))(value)
+
+    def _encode(self, mapping):
+        try:
+            text = self.encode(mapping)
+        except UnicodeDecodeError:  # pragma: no cover
+            # Python 2 byte strings that aren't valid text:
+            text = self.encode(Event(
+                (k, repr(v) if isinstance(v, bytes) else v)
+                for (k, v) in mapping.items()
+            ))
+        # non-ascii characters are escaped, so this never fails:
+        return text.encode('ascii')
+
+    def render_event(self, event):
+        if isinstance(event, LazyEvent):
+            event = event.materialize()
+        return self._encode(event)
+
+    def render_bound(self, context):
+        # leave the object open so values can be added:
+        return self._encode(context)[:-1]
+
+    def render_values(self, rendered, event):
+        data = self._encode(event.values)
+        if rendered == b'{':
+            return data
+        if data == b'{}':
+            return rendered+b'}'
+        return rendered+b','+data[1:]
 
 
 class LTSV(Serializer):
     # http://ltsv.org/
 
-    def __init__(self, stream, label_sep=':', item_sep='\t'):
-        super(LTSV, self).__init__(stream)
+    def __init__(self, stream, label_sep=':', item_sep='\t', **kw):
+        super(LTSV, self).__init__(stream, **kw)
         assert set(len(sep) for sep in (label_sep, item_sep)) == {1}, \
             'separators can only be one character is length'
         assert ' ' not in (label_sep, item_sep), \
             'space cannot be used as a separator'
         self.label_sep = label_sep
         self.item_sep = item_sep
-        self.sub = re.compile('['+'\n\r'+label_sep+item_sep+']').sub
+        self.table = dict((ord(c), u' ')
+                          for c in '\n\r'+label_sep+item_sep)
+        # ints and floats can be used as they are unless a separator could
+        # appear in them:
+        if set(label_sep+item_sep) & set('0123456789.+-aefin'):
+            self.clean_types = frozenset()
+        else:
+            self.clean_types = frozenset((int, float))
+        self.format_key = ('ltsv', label_sep, item_sep)
 
     def quote(self, item):
-        try:
-            item = Unicode(item)
-        except UnicodeDecodeError:
-            item = repr(item)
-        return self.sub(' ', item)
+        kind = type(item)
+        if kind is Unicode:
+            text = item
+        elif kind in self.clean_types:
+            return str(item)
+        else:
+            try:
+                text = Unicode(item)
+            except UnicodeDecodeError:
+                text = repr(item)
+        if ('\n' in text or '\r' in text or
+                self.label_sep in text or self.item_sep in text):
+            return text.translate(self.table)
+        return text
 
-    def __call__(self, event):
-        self.write(event.serialize(
-            kw=self.label_sep, join=self.item_sep.join, quote=self.quote
+    def _serialize(self, items):
+        return serialize(items, kw=self.label_sep, join=self.item_sep.join,
+                         quote=self.quote)
+
+    def render_event(self, event):
+        return self._serialize(event.items())
+
+    def render_bound(self, context):
+        return self._serialize(context.items())
+
+    def render_values(self, rendered, event):
+        text = self._serialize(event.values.items())
+        if rendered and text:
+            return rendered+self.item_sep+text
+        return rendered or text
+
+
+CONVERSIONS = {None: '', 's': 'str', 'r': 'repr', 'a': 'ascii'}
+
+
+def template_keys(template):
+    """
+    Return the keys used by the supplied :meth:`str.format` template,
+    including those nested in format specifications.
+    """
+    keys = set()
+    for literal, key, spec, conversion in Formatter().parse(template):
+        if key is not None:
+            keys.add(key)
+        if spec and '{' in spec:
+            keys.update(template_keys(spec))
+    return keys
+
+
+def template_source(template, only):
+    parts = []
+    for literal, key, spec, conversion in Formatter().parse(template):
+        if literal:
+            parts.append(repr(literal))
+        if key is None:
+            continue
+        if only is None or key in only:
+            value = 'get(%r, u"")' % key
+        else:
+            value = 'u""'
+        if spec and '{' in spec:
+            # nested fields, such as the width in '{level:>{width}}':
+            spec = template_source(spec, only)
+        else:
+            spec = repr(spec)
+        parts.append('format(%s(%s), %s)' % (
+            CONVERSIONS[conversion], value, spec
         ))
+    if not parts:
+        return 'u""'
+    return 'u"".join((%s, ))' % ', '.join(parts)
+
+
+def compile_prefix(prefix, only=None):
+    """
+    Return a function that renders the supplied :meth:`str.format` template
+    from an event in the same way as ``prefix.format(**event)``, but with
+    the template parsed once and missing keys rendered as empty strings.
+    Keys not in `only`, if supplied, are also rendered as empty strings.
+    """
+    namespace = {'ascii': repr} if PY2 else {}
+    lines = [
+        'def render(event):',
+        '    get = event.get',
+        '    return ' + template_source(prefix, only),
+    ]
+    exec('\n'.join(lines), namespace)
+    return namespace['render']
 
 
 class Human(Serializer):
 
-    prefix_pattern = re.compile('(?<={)[^:!}]+')
     prefix_bad_pattern = re.compile('{\d*(?:[:!].*)?}')
     only = None
 
-    def __init__(self, stream, prefix='', ignore=None, only=None):
-        super(Human, self).__init__(stream)
+    def __init__(self, stream, prefix='', ignore=None, only=None, **kw):
+        super(Human, self).__init__(stream, **kw)
         bad_prefix = self.prefix_bad_pattern.findall(prefix)
         if bad_prefix:
             raise AssertionError('bad prefix templating: {}'.format(
                 ', '.join(bad_prefix)
             ))
         self.prefix = prefix
-        self.prefix_keys = set(self.prefix_pattern.findall(prefix))
+        self.prefix_keys = template_keys(prefix)
+        self._render_prefix = compile_prefix(prefix, only)
         self.exclude_keys = set(self.prefix_keys)
         if ignore:
             self.exclude_keys.update(ignore)
         if only:
             self.only = set(only)
+        self.format_key = ('human', prefix, frozenset(self.exclude_keys),
+                           self.only and frozenset(self.only))
 
-    def __call__(self, event):
-        if self.only is not None:
-            event = Event((k, v) for (k, v) in event.items()
-                          if k in self.only)
-        exclude, post = event.extract_newline_values(self.exclude_keys)
-        self.write(
-            self.prefix.format(**{k: event.get(k, '')
-                                  for k in self.prefix_keys}),
-            event.serialize(exclude),
+    def _render_items(self, items):
+        return render(items, self.exclude_keys, only=self.only)
+
+    def render_bound(self, context):
+        return self._render_items(context.items())
+
+    def render_values(self, rendered, event):
+        bound_text, bound_post = rendered
+        text, post = self._render_items(event.values.items())
+        if bound_text and text:
+            text = bound_text+', '+text
+        else:
+            text = bound_text or text
+        return u''.join((
+            self._render_prefix(event),
+            text,
+            bound_post,
             post,
-        )
+        ))
+
+    def render_event(self, event):
+        text, post = self._render_items(event.items())
+        return u''.join((self._render_prefix(event), text, post))
+
+
+class Tee(object):
+    """
+    A target that passes each event to several serializers, rendering it
+    only once for each group of serializers that would render it in the
+    same way, such as a :class:`Human` writing to a file and another writing
+    to :data:`STDERR`.
+
+    Serializers are grouped by their class, :attr:`~Serializer.format_key`
+    and timestamp formatting; those with a ``format_key`` of ``None`` are
+    always passed the event to render themselves.
+
+    As with a :class:`~shoehorn.targets.compose.Layer`, an error in one
+    serializer does not stop the event being passed to the others.
+
+    :param serializers: The serializers to pass events to.
+
+    :param error_target: The target to pass information about errors to.
+    """
+
+    def __init__(self, *serializers, **kw):
+        error_target = kw.pop('error_target', None)
+        assert not kw, 'only error_target is a keyword parameter'
+        self.serializers = serializers
+        self.error_target = error_target
+
+    def __call__(self, event):
+        level = event.get('level')
+        rendered = {}
+        for serializer in self.serializers:
+            try:
+                key = serializer.format_key
+                if key is None:
+                    serializer(event)
+                    continue
+                key = (type(serializer), key, serializer.timestamp_keys,
+                       serializer.time_format, serializer.tz)
+                text = rendered.get(key)
+                if text is None:
+                    text = rendered[key] = serializer.render(event)
+                serializer.write(text, level=level)
+            except Exception:
+                handle_error(self.error_target, exc_info(), event)
+
+    def flush(self):
+        for serializer in self.serializers:
+            serializer.flush()
+
+    def close(self):
+        for serializer in self.serializers:
+            serializer.close()
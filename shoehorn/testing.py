@@ -1,5 +1,3 @@
-from collections import deque
-
 from shoehorn import logging
 
 
@@ -25,14 +23,16 @@ class TestTarget(object):
 class Capture(object):
 
     def __init__(self, stack):
-        self._targets = deque()
+        self._targets = ()
         self.events = []
         self.stack = stack
+        self.active = False
 
     @property
     def targets(self):
+        targets = self.stack.targets if self.active else self._targets
         # don't include our own test target
-        return list(self._targets)[:-1]
+        return list(targets)[:-1]
 
     def error_target(self, event):
         raise
@@ -40,21 +40,23 @@ class Capture(object):
     def start(self):
         # vars is just a view, so need to take a copy:
         self.existing = dict(vars(self.stack))
-        self.stack.targets = self._targets
+        self.stack.targets = ()
         self.stack.error_target = self.error_target
         self.stack.error_target_installed = []
         target = TestTarget()
         self.stack.push(target)
         self.events = target.events
+        self.active = True
 
     def stop(self):
         targets = []
-        while self._targets:
+        while self.stack.targets:
             targets.append(self.stack.pop())
         for attr, value in self.existing.items():
             setattr(self.stack, attr, value)
         # for later inspection
         self._targets = targets
+        self.active = False
 
     def __enter__(self):
         self.start()
@@ -1,6 +1,17 @@
+import os
 import sys
 from subprocess import check_call
 from textwrap import dedent
+from timeit import repeat
+
+import pytest
+
+#: Timing comparisons are only run when asked for, as they depend on how
+#: loaded the machine running the tests is.
+benchmark = pytest.mark.skipif(
+    not os.environ.get('SHOEHORN_BENCHMARKS'),
+    reason='set SHOEHORN_BENCHMARKS=1 to run benchmarks'
+)
 
 
 def run_in_ascii(dir, code, **kw):
@@ -9,3 +20,18 @@ def run_in_ascii(dir, code, **kw):
     path = dir.write('test.py', encoding='utf-8', data=dedent(code))
     return check_call([sys.executable, path, dir.getpath('test.log')],
                       env={'LC_ALL': 'C'}, **kw)
+
+
+def best_times(*functions, **kw):
+    """
+    Return the best time taken to call each of the supplied functions
+    `number` times, interleaving the timings so that all the functions see
+    the same machine load.
+    """
+    number = kw.pop('number', 500)
+    runs = kw.pop('runs', 9)
+    times = [[] for function in functions]
+    for i in range(runs):
+        for function, function_times in zip(functions, times):
+            function_times.extend(repeat(function, number=number, repeat=1))
+    return [min(function_times) for function_times in times]
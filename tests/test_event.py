@@ -1,9 +1,12 @@
+from collections import OrderedDict
+from sys import getsizeof
 from unittest import TestCase
 
-from testfixtures import compare
+from testfixtures import compare, ShouldRaise
 
-from shoehorn.compat import PY36
-from shoehorn.event import Event
+from shoehorn.compat import PY36, PY37
+from shoehorn.event import Event, LazyEvent, OrderedEvent
+from .common import benchmark, best_times
 
 
 class TestEvent(TestCase):
@@ -16,6 +19,18 @@ class TestEvent(TestCase):
         compare(str(Event([('x', 1), ('y', 2)])),
                 expected="Event(x=1, y=2)")
 
+    def test_render(self):
+        event = Event([('x', 1), ('c', 'foo\nbar'), ('y', '2'), ('z', 3)])
+        compare(event.render(), expected=("x=1, y='2', z=3", '\nc:\nfoo\nbar'))
+        exclude, post = event.extract_newline_values({'z'})
+        compare(event.render({'z'}), expected=(event.serialize(exclude), post))
+
+    def test_render_options(self):
+        event = Event([('x', 1), ('c', 'foo\nbar'), ('y', '2'), ('z', 3)])
+        compare(event.render(frozenset('x'), ' '.join, ':', str, '|', '=',
+                             only={'c', 'x', 'y'}),
+                expected=('y:2', '|c=foo\nbar'))
+
     if PY36:
 
         def test_repr_kw_ordered(self):
@@ -23,3 +38,110 @@ class TestEvent(TestCase):
 
         def test_str_kw_ordered(self):
             compare(str(Event(x=1, y=2)), expected="Event(x=1, y=2)")
+
+
+class TestLazyEvent(TestCase):
+
+    def setUp(self):
+        self.context = Event([('x', 1), ('y', 2)])
+        self.event = LazyEvent(self.context, dict(y=3, z=4))
+
+    def test_read(self):
+        compare(self.event['x'], expected=1)
+        compare(self.event['y'], expected=3)
+        compare(self.event.get('z'), expected=4)
+        compare(self.event.get('a', 'default'), expected='default')
+        assert 'x' in self.event
+        assert 'a' not in self.event
+        with ShouldRaise(KeyError('a')):
+            self.event['a']
+        assert self.event.event is None
+
+    def test_iteration_order(self):
+        compare(list(self.event), expected=['x', 'y', 'z'])
+        compare(list(self.event.items()),
+                expected=[('x', 1), ('y', 3), ('z', 4)])
+        compare(len(self.event), expected=3)
+
+    def test_equality(self):
+        expected = Event([('x', 1), ('y', 3), ('z', 4)])
+        assert self.event == expected
+        assert expected == self.event
+
+    def test_repr(self):
+        compare(repr(self.event), expected="Event(x=1, y=3, z=4)")
+
+    def test_set_does_not_materialize(self):
+        self.event['x'] = 5
+        self.event['a'] = 6
+        compare(list(self.event.items()),
+                expected=[('x', 5), ('y', 3), ('z', 4), ('a', 6)])
+        assert self.event.event is None
+        compare(self.context, expected=Event([('x', 1), ('y', 2)]))
+
+    def test_delete_value(self):
+        compare(self.event.pop('z'), expected=4)
+        compare(self.event.pop('z', None), expected=None)
+        assert self.event.event is None
+        compare(list(self.event), expected=['x', 'y'])
+
+    def test_delete_context(self):
+        del self.event['x']
+        assert self.event.event is not None
+        compare(list(self.event.items()), expected=[('y', 3), ('z', 4)])
+        compare(self.context, expected=Event([('x', 1), ('y', 2)]))
+
+    def test_materialize(self):
+        event = self.event.materialize()
+        assert type(event) is Event
+        compare(list(event.items()), expected=[('x', 1), ('y', 3), ('z', 4)])
+        assert self.event.materialize() is event
+        self.event['a'] = 1
+        compare(event['a'], expected=1)
+
+    def test_serialize(self):
+        event = LazyEvent({'x': 'a\nb'}, dict(y=1))
+        exclude, post = event.extract_newline_values()
+        compare(exclude, expected={'x'})
+        compare(post, expected='\nx:\na\nb')
+        compare(self.event.serialize({'y'}), expected='x=1, z=4')
+
+    def test_render(self):
+        event = LazyEvent({'x': 'a\nb'}, dict(y=1))
+        compare(event.render(), expected=('y=1', '\nx:\na\nb'))
+        assert event.event is None
+
+
+class TestCompactEvent(TestCase):
+
+    items = [('key%i' % i, i) for i in range(10)]
+
+    def test_same_behaviour(self):
+        compact, ordered = Event(self.items), OrderedEvent(self.items)
+        compare(repr(compact), expected=repr(ordered))
+        compare(compact.serialize(), expected=ordered.serialize())
+        compare(list(compact.items()), expected=list(ordered.items()))
+        compact_copy, ordered_copy = compact.copy(), ordered.copy()
+        compare(type(compact_copy), expected=Event)
+        compare(type(ordered_copy), expected=OrderedEvent)
+        compare(repr(compact_copy), expected=repr(ordered_copy))
+        compare(list(compact_copy.items()),
+                expected=list(ordered_copy.items()))
+
+    if PY37:
+
+        def test_backend(self):
+            assert isinstance(Event(), dict)
+            assert not isinstance(Event(), OrderedDict)
+
+        def test_memory(self):
+            compact = getsizeof(Event(self.items))
+            ordered = getsizeof(OrderedEvent(self.items))
+            assert compact < ordered, (compact, ordered)
+
+        @benchmark
+        def test_throughput(self):
+            compact, ordered = best_times(lambda: Event(self.items),
+                                          lambda: OrderedEvent(self.items),
+                                          number=1000)
+            assert compact < ordered, (compact, ordered)
@@ -1,10 +1,11 @@
+from sys import modules
 from unittest import TestCase
 
-from testfixtures import compare, ShouldRaise
+from testfixtures import compare, ShouldRaise, Replacer
 
 from shoehorn import Logger, get_logger
 from shoehorn.compat import PY36
-from shoehorn.event import Event
+from shoehorn.event import Event, LazyEvent
 from shoehorn.testing import capture as log_capture
 
 
@@ -157,6 +158,15 @@ class TestLogger(TestCase):
                 (('before', 1), ('after', 2), ('level', 'info'))
             )
 
+    def test_builtins_after_context(self):
+        self.logger.log_ordered('info', ('b', 1), ('a', 2))
+        self.logger.info('foo', 'bar', x=1)
+        self.check_ordered(
+            (('b', 1), ('a', 2), ('level', 'info')),
+            (('x', 1), ('level', 'info'),
+             ('message', 'foo'), ('args', ('bar', ))),
+        )
+
     def test_bind_ordered(self):
         log = self.logger.bind_ordered(('before', 1), ('after', 2))
         log.info('oh hai')
@@ -185,3 +195,209 @@ class TestGetLogger(object):
         compare(log_capture.events, expected=[
             {'x': 'foo', 'y': 'bar', 'level': 'info', 'message': 'baz'},
         ])
+
+
+class TestLevel(TestCase):
+
+    def setUp(self):
+        self.records = []
+
+    def test_threshold(self):
+        logger = Logger(self.records.append, level='warning')
+        logger.debug('foo')
+        logger.info('foo')
+        logger.warning('foo')
+        logger.error('foo')
+        logger.exception('foo')
+        logger.critical('foo')
+        compare(self.records, expected=[
+            Event(level='warning', message='foo'),
+            Event(level='error', message='foo'),
+            Event(level='error', message='foo', exc_info=True),
+            Event(level='critical', message='foo'),
+        ])
+
+    def test_numeric_threshold(self):
+        logger = Logger(self.records.append, level=25)
+        logger.info('foo')
+        logger.log(24, 'foo')
+        logger.log(25, 'bar')
+        logger.log('warning', 'baz')
+        compare(self.records, expected=[
+            Event(level=25, message='bar'),
+            Event(level='warning', message='baz'),
+        ])
+
+    def test_unknown_level_always_logged(self):
+        logger = Logger(self.records.append, level='critical')
+        logger.log('yuhwut?', 'foo')
+        logger.log_ordered('error', ('x', 1))
+        compare(self.records, expected=[
+            Event(level='yuhwut?', message='foo'),
+        ])
+
+    def test_inherited_by_bind(self):
+        logger = Logger(self.records.append, level='info')
+        bound = logger.bind(x=1).bind_ordered(('y', 2))
+        bound.debug('foo')
+        bound.info('bar')
+        compare(self.records, expected=[
+            Event(x=1, y=2, level='info', message='bar'),
+        ])
+
+    def test_set_level(self):
+        logger = Logger(self.records.append)
+        logger.debug('foo')
+        logger.set_level('info')
+        logger.debug('bar')
+        compare(self.records, expected=[
+            Event(level='debug', message='foo'),
+        ])
+
+    def test_set_level_alias(self):
+        logger = Logger(self.records.append, level='warn')
+        logger.info('foo')
+        logger.warning('bar')
+        logger.set_level('fatal')
+        logger.error('baz')
+        compare(self.records, expected=[
+            Event(level='warning', message='bar'),
+        ])
+
+    def test_set_level_none(self):
+        logger = Logger(self.records.append, level='error')
+        logger.set_level(None)
+        logger.debug('foo')
+        compare(self.records, expected=[
+            Event(level='debug', message='foo'),
+        ])
+
+    def test_set_level_unknown(self):
+        logger = Logger(self.records.append, level='info')
+        with ShouldRaise(AssertionError("unknown level: 'wrning'")):
+            logger.set_level('wrning')
+        logger.debug('foo')
+        logger.info('bar')
+        compare(self.records, expected=[
+            Event(level='info', message='bar'),
+        ])
+
+    def test_no_event_below_threshold(self):
+        logger = Logger(self.records.append, level='info')
+        def boom(*args):
+            raise AssertionError('Event created')
+        with Replacer() as r:
+            r.replace('.Event', boom, container=modules['shoehorn.logger'])
+            logger.debug('foo')
+        compare(self.records, expected=[])
+
+
+class TestContext(TestCase):
+
+    def setUp(self):
+        self.records = []
+        self.logger = Logger(self.records.append)
+
+    def check(self, *expected):
+        compare(expected, actual=self.records)
+
+    def test_bind_shares_parent(self):
+        parent = self.logger.bind(x=1)
+        child = parent.bind(y=2)
+        assert child.context.parent is parent.context
+        compare(child.context.items, expected=(('y', 2), ))
+
+    def test_alter_after_bind(self):
+        parent = self.logger.bind(x=1)
+        child = parent.bind(y=2)
+        parent.alter(x=3)
+        parent.info('foo')
+        child.info('bar')
+        self.check(
+            Event(x=3, level='info', message='foo'),
+            Event(x=1, y=2, level='info', message='bar'),
+        )
+
+    def test_alter_does_not_grow_chain(self):
+        logger = self.logger.bind(x=1)
+        for i in range(5):
+            logger.alter(y=i)
+            logger.info('foo')
+        assert logger.context.parent is None
+        compare(logger.context.items, expected=(('x', 1), ('y', 4)))
+        compare(self.records[-1], expected=Event(
+            x=1, y=4, level='info', message='foo'
+        ))
+
+    def test_deep_chain(self):
+        logger = self.logger
+        for i in range(2000):
+            logger = logger.bind_ordered(('x', i), ('x%i' % i, i))
+        logger.info('foo')
+        event = self.records[0]
+        compare(len(event), expected=2003)
+        compare(event['x'], expected=1999)
+        compare(list(event)[:3], expected=['x', 'x0', 'x1'])
+
+    def test_flatten_cached(self):
+        logger = self.logger.bind(x=1)
+        flat = logger.context.flatten()
+        assert logger.context.flatten() is flat
+        logger.info('foo')
+        logger.info('bar')
+        assert self.records[0] is not flat
+        assert self.records[1] is not flat
+        compare(flat, expected={'x': 1})
+
+    def test_flatten_reuses_parent_cache(self):
+        parent = self.logger.bind(x=1)
+        parent.context.flatten()
+        child = parent.bind(y=2)
+        compare(child.context.flatten(), expected={'x': 1, 'y': 2})
+        compare(parent.context.flatten(), expected={'x': 1})
+
+    def test_repr(self):
+        logger = self.logger.bind_ordered(('x', 1), ('y', 'a'))
+        compare(repr(logger.context), expected="Context(x=1, y='a')")
+
+
+class TestLazy(TestCase):
+
+    def setUp(self):
+        self.records = []
+        self.logger = Logger(self.records.append, lazy=True)
+
+    def test_simple(self):
+        self.logger.bind(x=1, y=2).info('foo', 'bar', y=3)
+        event, = self.records
+        assert isinstance(event, LazyEvent)
+        compare(event, expected=Event(x=1, y=3, level='info',
+                                      message='foo', args=('bar', )))
+
+    def test_ordered(self):
+        logger = self.logger.bind_ordered(('x', 1), ('y', 2))
+        logger.log_ordered('info', ('y', 3), ('z', 4))
+        compare(list(self.records[0].items()),
+                expected=[('x', 1), ('y', 3), ('z', 4), ('level', 'info')])
+
+    def test_context_shared_not_modified(self):
+        logger = self.logger.bind(x=1)
+        logger.info('foo')
+        self.records[0]['x'] = 2
+        del self.records[0]['x']
+        logger.info('bar')
+        compare(self.records[1]['x'], expected=1)
+        assert self.records[1].context is logger.context.flatten()
+
+    def test_builtins_after_context(self):
+        self.logger.log_ordered('info', ('b', 1), ('a', 2))
+        self.logger.info('foo', 'bar', x=1)
+        compare([list(r.items()) for r in self.records], expected=[
+            [('b', 1), ('a', 2), ('level', 'info')],
+            [('x', 1), ('level', 'info'),
+             ('message', 'foo'), ('args', ('bar', ))],
+        ])
+
+    def test_inherited_by_bind(self):
+        self.logger.bind(x=1).info('foo')
+        assert isinstance(self.records[0], LazyEvent)
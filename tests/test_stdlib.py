@@ -3,7 +3,7 @@ from logging import WARNING, StreamHandler, getLogger, FileHandler
 from tempfile import NamedTemporaryFile
 
 import pytest
-from testfixtures import LogCapture, OutputCapture, compare
+from testfixtures import LogCapture, OutputCapture, Replace, compare
 
 from shoehorn import get_logger, logging
 from shoehorn.compat import PY2, PY36
@@ -106,6 +106,56 @@ class TestStandardLibraryTarget(object):
                 actual=capture.records[-1].stack_info.split('\n')[0])
 
 
+class TestFastStandardLibraryTarget(TestStandardLibraryTarget):
+
+    @pytest.fixture()
+    def target(self):
+        return StandardLibraryTarget(fast=True)
+
+    def test_disabled_level(self, target, capture):
+        getLogger('quiet').setLevel(WARNING)
+        try:
+            with Replace('logging.Logger.makeRecord', None):
+                target(Event(message='foo', logger='quiet'))
+        finally:
+            getLogger('quiet').setLevel(0)
+        capture.check()
+
+    def test_exc_info_exception(self, target, capture):
+        bad = Exception('bad')
+        event = Event(level='error', message='foo', exc_info=bad)
+        target(event)
+        capture.check(('root', 'ERROR', 'foo', event))
+        compare(bad, actual=capture.records[-1].exc_info[1])
+
+    def test_no_caller(self, target, capture):
+        target(Event(message='foo'))
+        record = capture.records[-1]
+        compare((record.pathname, record.lineno, record.funcName),
+                expected=('(unknown file)', 0, '(unknown function)'))
+
+    def test_find_caller(self, capture):
+        target = StandardLibraryTarget(fast=True, find_caller=True)
+        logging.push(target)
+        try:
+            logger.info('foo')
+        finally:
+            logging.pop()
+        record = capture.records[-1]
+        compare((record.pathname, record.funcName),
+                expected=(__file__.replace('.pyc', '.py'),
+                          'test_find_caller'))
+
+    def test_max_loggers(self, target, capture):
+        target = StandardLibraryTarget(fast=True, max_loggers=2)
+        for name in 'a', 'b', 'c':
+            target(Event(message=name, logger=name))
+        compare(sorted(target.loggers), expected=['c'])
+        capture.check(('a', 'INFO', 'a', Event(message='a', logger='a')),
+                      ('b', 'INFO', 'b', Event(message='b', logger='b')),
+                      ('c', 'INFO', 'c', Event(message='c', logger='c')))
+
+
 class TestStandardLibraryFullStack(object):
 
     def test_minimal(self, capture):
@@ -0,0 +1,191 @@
+from threading import Thread
+from types import TracebackType
+
+import pytest
+from testfixtures import Comparison as C, Replace, compare
+
+from shoehorn.compat import PY2
+from shoehorn.event import Event
+from shoehorn.targets.compose import Stack
+from shoehorn.testing import TestTarget
+
+if PY2:
+    pytestmark = pytest.mark.skip('asyncio requires Python 3')
+else:
+    import asyncio
+    from threading import get_ident
+    from shoehorn.targets.aio import AsyncTarget, _get_running_loop
+
+
+@pytest.fixture()
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+class RecordingTarget(TestTarget):
+
+    def __init__(self):
+        super(RecordingTarget, self).__init__()
+        self.threads = []
+        self.calls = []
+
+    def __call__(self, event):
+        self.threads.append(get_ident())
+        super(RecordingTarget, self).__call__(event)
+
+    def flush(self):
+        self.calls.append('flush')
+
+    def close(self):
+        self.calls.append('close')
+
+
+class TestAsyncTarget(object):
+
+    def test_simple(self, loop):
+        t = RecordingTarget()
+        target = AsyncTarget(t)
+        loop.call_soon(target, 'event 1')
+        loop.call_soon(target, 'event 2')
+        loop.run_until_complete(target.flush())
+        compare(t.events, expected=['event 1', 'event 2'])
+        compare(t.calls, expected=['flush'])
+        assert get_ident() not in t.threads
+        loop.run_until_complete(target.aclose())
+        compare(t.calls, expected=['flush', 'flush', 'close'])
+
+    def test_does_not_block_loop(self, loop):
+        t = RecordingTarget()
+        target = AsyncTarget(t)
+        queued = []
+
+        def log():
+            target('event')
+            # not yet written, just queued:
+            queued.append(list(t.events))
+
+        loop.call_soon(log)
+        loop.run_until_complete(target.aclose())
+        compare(queued, expected=[[]])
+        compare(t.events, expected=['event'])
+
+    def test_no_get_running_loop(self, loop):
+        # Python 3.6:
+        t = RecordingTarget()
+        target = AsyncTarget(t)
+        with Replace('shoehorn.targets.aio.get_running_loop',
+                     _get_running_loop):
+            target('before')
+            loop.call_soon(target, 'during')
+            loop.run_until_complete(target.aclose())
+        compare(t.events, expected=['before', 'during'])
+        assert target.task is None
+
+    def test_no_loop(self):
+        t = RecordingTarget()
+        target = AsyncTarget(t)
+        target('event')
+        compare(t.events, expected=['event'])
+        compare(t.threads, expected=[get_ident()])
+
+    def test_after_close(self, loop):
+        t = RecordingTarget()
+        target = AsyncTarget(t)
+        target.start(loop)
+        loop.run_until_complete(target.aclose())
+        loop.call_soon(target, 'event')
+        loop.run_until_complete(asyncio.sleep(0))
+        compare(t.events, expected=['event'])
+        assert target.task is None
+
+    def finish_without_close(self, target, loop):
+        # what asyncio.run() does to the drain task if aclose() isn't awaited:
+        target.task.cancel()
+        loop.run_until_complete(asyncio.sleep(0))
+        loop.close()
+
+    def test_loop_finished_without_close(self, loop):
+        t = RecordingTarget()
+        target = AsyncTarget(t)
+        loop.call_soon(target, 'one')
+        loop.run_until_complete(target.flush())
+        self.finish_without_close(target, loop)
+        target('two')
+        target('three')
+        compare(t.events, expected=['one', 'two', 'three'])
+        compare(len(target.events), expected=0)
+        assert target.task is None
+
+    def test_queued_events_when_loop_finished(self, loop):
+        t = RecordingTarget()
+        target = AsyncTarget(t)
+        target.start(loop)
+        target.events.append('one')
+        self.finish_without_close(target, loop)
+        target('two')
+        compare(t.events, expected=['one', 'two'])
+
+    def test_restart_on_new_loop(self, loop):
+        t = RecordingTarget()
+        target = AsyncTarget(t)
+        loop.call_soon(target, 'one')
+        loop.run_until_complete(target.flush())
+        self.finish_without_close(target, loop)
+        new_loop = asyncio.new_event_loop()
+        try:
+            new_loop.call_soon(target, 'two')
+            new_loop.run_until_complete(target.aclose())
+        finally:
+            new_loop.close()
+        compare(t.events, expected=['one', 'two'])
+        compare(t.calls, expected=['flush', 'flush', 'close'])
+
+    def test_from_other_thread(self, loop):
+        t = RecordingTarget()
+        target = AsyncTarget(t)
+        target.start(loop)
+        loop.run_until_complete(asyncio.sleep(0))
+        thread = Thread(target=target, args=('event', ))
+        thread.start()
+        thread.join()
+        loop.run_until_complete(asyncio.sleep(0))
+        loop.run_until_complete(target.aclose())
+        compare(t.events, expected=['event'])
+
+    def test_maxsize(self, loop):
+        t = RecordingTarget()
+        target = AsyncTarget(t, maxsize=2)
+
+        def log():
+            for i in range(5):
+                target(i)
+
+        loop.call_soon(log)
+        loop.run_until_complete(target.aclose())
+        compare(t.events, expected=[0, 1])
+        compare(target.dropped, expected=3)
+
+    def test_serializer(self, loop, dir):
+        from shoehorn.targets.serialize import LTSV
+        target = AsyncTarget(LTSV(dir.getpath('test.log')))
+        loop.call_soon(target, Event(x=1))
+        loop.run_until_complete(target.aclose())
+        compare(dir.read('test.log'), expected=b'x:1\n')
+
+    def test_error(self, loop):
+        e = Exception('boom!')
+
+        def boom(event):
+            raise e
+
+        errors = TestTarget()
+        target = AsyncTarget(boom)
+        stack = Stack(target, error_target=errors)
+        loop.call_soon(stack, 'event')
+        loop.run_until_complete(target.aclose())
+        compare(errors.events, expected=[Event(
+            exc_info=(Exception, e, C(TracebackType)),
+            event="'event'"
+        )])
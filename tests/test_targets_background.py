@@ -0,0 +1,196 @@
+from threading import Event as ThreadingEvent, Thread, current_thread
+from types import TracebackType
+
+import pytest
+from testfixtures import Comparison as C, Replacer, ShouldRaise, compare
+
+from shoehorn.event import Event
+from shoehorn.targets.background import (
+    QueueTarget, BLOCK, DROP_OLDEST, DROP_NEWEST
+)
+from shoehorn.targets.compose import Stack
+from shoehorn.testing import TestTarget
+
+
+class Blocker(TestTarget):
+    """
+    A target that doesn't return until released, so the queue can be
+    filled up.
+    """
+
+    def __init__(self):
+        super(Blocker, self).__init__()
+        self.started = ThreadingEvent()
+        self.release = ThreadingEvent()
+
+    def __call__(self, event):
+        self.started.set()
+        self.release.wait()
+        super(Blocker, self).__call__(event)
+
+
+class TestQueueTarget(object):
+
+    def test_simple(self):
+        t = TestTarget()
+        q = QueueTarget(t, flush_at_exit=False)
+        q('event 1')
+        q('event 2')
+        assert q.flush(timeout=5)
+        compare(t.events, expected=['event 1', 'event 2'])
+        q.close()
+
+    def test_runs_on_other_thread(self):
+        threads = []
+        q = QueueTarget(lambda event: threads.append(current_thread()),
+                        flush_at_exit=False)
+        q('event')
+        q.close()
+        compare(threads, expected=[q.thread], recursive=False)
+
+    def test_wraps_stack(self):
+        t = TestTarget()
+        q = QueueTarget(Stack(lambda event: event+'!', t),
+                        flush_at_exit=False)
+        q('event')
+        q.close()
+        compare(t.events, expected=['event!'])
+
+    def test_close_drains(self):
+        t = TestTarget()
+        q = QueueTarget(t, flush_at_exit=False)
+        for i in range(100):
+            q(i)
+        q.close()
+        compare(t.events, expected=list(range(100)))
+        assert not q.thread.is_alive()
+
+    def test_after_close(self):
+        t = TestTarget()
+        q = QueueTarget(t, flush_at_exit=False)
+        q.close()
+        q('event')
+        compare(t.events, expected=['event'])
+
+    def fill(self, policy):
+        t = Blocker()
+        q = QueueTarget(t, maxsize=2, policy=policy, flush_at_exit=False)
+        q('event 1')
+        assert t.started.wait(5)
+        # event 1 is being handled, so these fill the queue:
+        q('event 2')
+        q('event 3')
+        return t, q
+
+    def test_drop_newest(self):
+        t, q = self.fill(DROP_NEWEST)
+        q('event 4')
+        compare(q.dropped, expected=1)
+        t.release.set()
+        q.close()
+        compare(t.events, expected=['event 1', 'event 2', 'event 3'])
+
+    def test_drop_oldest(self):
+        t, q = self.fill(DROP_OLDEST)
+        q('event 4')
+        q('event 5')
+        compare(q.dropped, expected=2)
+        t.release.set()
+        q.close()
+        compare(t.events, expected=['event 1', 'event 4', 'event 5'])
+
+    def test_block(self):
+        t, q = self.fill(BLOCK)
+        blocked = Thread(target=q, args=('event 4', ))
+        blocked.start()
+        blocked.join(0.05)
+        assert blocked.is_alive()
+        t.release.set()
+        blocked.join(5)
+        q.close()
+        compare(q.dropped, expected=0)
+        compare(t.events,
+                expected=['event 1', 'event 2', 'event 3', 'event 4'])
+
+    def test_flush_timeout(self):
+        t, q = self.fill(BLOCK)
+        assert not q.flush(timeout=0.01)
+        t.release.set()
+        assert q.flush(timeout=5)
+        q.close()
+
+    def test_error(self):
+        e = Exception('boom!')
+
+        def boom(event):
+            raise e
+
+        errors = TestTarget()
+        t = TestTarget()
+        s = Stack(error_target=errors)
+        q = QueueTarget(boom, flush_at_exit=False)
+        s.push(q)
+        s('event 1')
+        q.flush()
+        q.target = t
+        s('event 2')
+        q.close()
+        compare(errors.events, expected=[Event(
+            exc_info=(Exception, e, C(TracebackType)),
+            event="'event 1'"
+        )])
+        compare(t.events, expected=['event 2'])
+
+    def test_error_target_fails(self):
+        def boom(event):
+            if event != 'ok':
+                raise Exception('boom!')
+
+        def bad_error_target(event):
+            raise Exception('error target boom!')
+
+        t = TestTarget()
+        q = QueueTarget(boom, maxsize=2, flush_at_exit=False)
+        q.error_target = bad_error_target
+        for i in range(5):
+            q(i)
+        assert q.flush(timeout=5)
+        assert q.thread.is_alive()
+        q.target = t
+        q('event')
+        q.close()
+        compare(t.events, expected=['event'])
+
+    @pytest.mark.filterwarnings(
+        'ignore::pytest.PytestUnhandledThreadExceptionWarning'
+    )
+    def test_worker_gone(self):
+        def stop(event):
+            raise SystemExit()
+
+        t = TestTarget()
+        q = QueueTarget(stop, maxsize=1, flush_at_exit=False)
+        q('event 1')
+        q.thread.join(5)
+        assert not q.thread.is_alive()
+        q.target = t
+        # neither queued nor blocked, even though the queue is full:
+        q.events.append('stuck')
+        q('event 2')
+        compare(t.events, expected=['event 2'])
+
+    def test_at_exit(self):
+        registered = []
+        with Replacer() as r:
+            r.replace('atexit.register', registered.append)
+            r.replace('atexit.unregister', registered.remove)
+            q = QueueTarget(TestTarget())
+            compare(registered, expected=[q.close])
+            q.close()
+            compare(registered, expected=[])
+
+    def test_bad_policy(self):
+        with ShouldRaise(AssertionError(
+            'policy must be one of: block, drop_oldest, drop_newest'
+        )):
+            QueueTarget(TestTarget(), policy='wut')
@@ -0,0 +1,147 @@
+from datetime import datetime
+from io import BytesIO, StringIO
+
+from testfixtures import ShouldRaise, compare
+
+from shoehorn.event import Event
+from shoehorn.targets.binary import Binary, read, MAGIC
+from shoehorn.targets.serialize import Human
+
+
+class FailingStream(BytesIO):
+
+    fail = False
+
+    def write(self, data):
+        if self.fail:
+            raise IOError('disk full')
+        return BytesIO.write(self, data)
+
+
+class BadStr(object):
+
+    def __str__(self):
+        raise Exception('boom')
+
+    __unicode__ = __str__
+
+
+def round_trip(*events):
+    stream = BytesIO()
+    target = Binary(stream)
+    for event in events:
+        target(event)
+    return stream.getvalue(), list(read(BytesIO(stream.getvalue())))
+
+
+class TestBinary(object):
+
+    def test_types(self):
+        event = Event((
+            ('none', None),
+            ('true', True),
+            ('false', False),
+            ('zero', 0),
+            ('int', 300),
+            ('negative', -1),
+            ('big', 2 ** 100),
+            ('float', 1.5),
+            ('text', u'\u00A3\n'),
+            ('bytes', b'\xa3'),
+            ('list', [1, u'a']),
+            ('tuple', (u'b', 2)),
+            ('mapping', {u'x': [None]}),
+            ('other', datetime(2001, 1, 2)),
+        ))
+        data, events = round_trip(event)
+        expected = Event(event)
+        expected['other'] = u'2001-01-02 00:00:00'
+        compare(events, expected=[expected])
+        compare(list(events[0]), expected=list(event))
+
+    def test_keys_interned(self):
+        data, events = round_trip(Event(level=u'info'), Event(level=u'info'))
+        compare(events, expected=[Event(level=u'info')] * 2)
+        compare(data.count(b'level'), expected=1)
+
+    def test_new_keys(self):
+        data, events = round_trip(Event(x=1), Event(y=2, x=3), Event())
+        compare(events, expected=[Event(x=1), Event(y=2, x=3), Event()])
+
+    def test_append(self, dir):
+        path = dir.getpath('test.log')
+        for value in 1, 2:
+            target = Binary(path)
+            target(Event(x=value))
+            target.close()
+        compare(dir.read('test.log').count(MAGIC), expected=2)
+        with open(path, 'rb') as stream:
+            compare(list(read(stream)), expected=[Event(x=1), Event(x=2)])
+
+    def test_partial_record(self):
+        data, events = round_trip(Event(x=1), Event(y=2))
+        compare(list(read(BytesIO(data[:-1]))), expected=[Event(x=1)])
+
+    def test_empty(self):
+        compare(list(read(BytesIO(b''))), expected=[])
+
+    def test_bad_magic(self):
+        with ShouldRaise(ValueError("unknown format: b'wut'")):
+            list(read(BytesIO(b'R\x03wut')))
+
+    def test_no_reset(self):
+        with ShouldRaise(ValueError('no reset record at start of stream')):
+            list(read(BytesIO(b'K\x01x')))
+
+    def test_unknown_key(self):
+        with ShouldRaise(ValueError('unknown key: 5')):
+            list(read(BytesIO(b'R\x0a' + MAGIC + b'E\x02\x05N')))
+
+    def test_failed_write(self):
+        stream = FailingStream()
+        target = Binary(stream)
+        stream.fail = True
+        with ShouldRaise(IOError('disk full')):
+            target(Event(x=1))
+        stream.fail = False
+        target(Event(x=2))
+        target(Event(x=3, y=4))
+        stream.fail = True
+        with ShouldRaise(IOError('disk full')):
+            target(Event(z=5))
+        stream.fail = False
+        target(Event(z=6))
+        compare(list(read(BytesIO(stream.getvalue()))),
+                expected=[Event(x=2), Event(x=3, y=4), Event(z=6)])
+
+    def test_failed_render(self):
+        stream = BytesIO()
+        target = Binary(stream)
+        target(Event(x=1))
+        with ShouldRaise(Exception('boom')):
+            target(Event(y=BadStr()))
+        target(Event(y=2))
+        compare(list(read(BytesIO(stream.getvalue()))),
+                expected=[Event(x=1), Event(y=2)])
+
+    def test_convert_to_text(self):
+        data, events = round_trip(
+            Event(level=u'info', message=u'foo', args=(1, )),
+        )
+        stream = StringIO()
+        target = Human(stream)
+        for event in read(BytesIO(data)):
+            target(event)
+        compare(stream.getvalue(),
+                expected=u"level='info', message='foo', args=(1,)\n")
+
+    def test_smaller_than_text(self):
+        events = [Event(level=u'info', message=u'request', request_id=i)
+                  for i in range(100)]
+        data, read_events = round_trip(*events)
+        compare(read_events, expected=events)
+        text = StringIO()
+        target = Human(text)
+        for event in events:
+            target(event)
+        assert len(data) < len(text.getvalue()) / 2
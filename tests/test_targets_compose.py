@@ -1,10 +1,15 @@
+from threading import Event as ThreadingEvent, Thread, current_thread
 from types import TracebackType
 
+import pytest
 from testfixtures import Comparison as C, compare
 
-from shoehorn.event import Event
+from shoehorn.compat import PY2
+from shoehorn.event import Event, LazyEvent
 from shoehorn.targets.compose import Stack, Layer
-from shoehorn.testing import TestTarget
+from shoehorn.targets.filter import RemoveKeys
+from shoehorn.testing import TestTarget, Capture
+from .common import benchmark, best_times
 
 
 class TestStack(object):
@@ -147,6 +152,146 @@ class TestStack(object):
         assert target.error_target == error_target2
 
 
+    def test_push_while_handling(self):
+        t = TestTarget()
+        s = Stack()
+
+        def push(event):
+            s.push(t)
+            return True
+
+        s.push(push, TestTarget())
+        s('event 1')
+        s('event 2')
+        # the push happened after the targets for event 1 were snapshotted:
+        compare(t.events, expected=['event 2'])
+        compare(len(s.targets), expected=3)
+
+    def test_pop_while_handling(self):
+        t = TestTarget()
+        s = Stack()
+
+        def pop(event):
+            s.pop()
+            return True
+
+        s.push(pop, t)
+        s('event 1')
+        s('event 2')
+        compare(t.events, expected=['event 1', 'event 2'])
+        compare(s.targets, expected=(t, ), recursive=False)
+
+    def test_concurrent_push_and_pop(self):
+        t = TestTarget()
+        s = Stack(t)
+        errors = []
+        s.error_target = errors.append
+        done = []
+
+        def reconfigure():
+            for i in range(2000):
+                s.push(lambda event: True)
+                s.pop()
+            done.append(True)
+
+        thread = Thread(target=reconfigure)
+        thread.start()
+        while not done:
+            s('event')
+        thread.join()
+        compare(errors, expected=[])
+        compare(s.targets, expected=(t, ), recursive=False)
+
+
+class TestCompiledStack(object):
+
+    def test_empty(self):
+        Stack(compiled=True)('event')
+
+    def test_one(self):
+        t = TestTarget()
+        s = Stack(t, compiled=True)
+        s('event')
+        compare(t.events, expected=['event'])
+
+    def test_propagation(self):
+        t1 = TestTarget(propagate=True)
+        t2 = TestTarget()
+        t3 = TestTarget()
+        s = Stack(t1, t2, t3, compiled=True)
+        s('event')
+        compare(t1.events, expected=['event'])
+        compare(t2.events, expected=['event'])
+        compare(t3.events, expected=[])
+
+    def test_replace_event(self):
+        t = TestTarget()
+        s = Stack(lambda event: True, lambda event: event+'!', t,
+                  compiled=True)
+        s('event')
+        compare(t.events, expected=['event!'])
+
+    def test_filter(self):
+        t = TestTarget()
+        s = Stack(lambda event: event['foo'] == 'bar', t, compiled=True)
+        s({'foo': 'bar'})
+        s({'foo': 'baz'})
+        compare(t.events, expected=[{'foo': 'bar'}])
+
+    def test_error_with_replaced_event(self):
+        e = Exception('boom!')
+        def handle(event):
+            raise e
+        errors = TestTarget()
+        t = TestTarget()
+        s = Stack(lambda event: event+'!', handle, t,
+                  error_target=errors, compiled=True)
+        s('event')
+        compare(errors.events, expected=[Event(
+            exc_info=(Exception, e, C(TracebackType)),
+            event="'event!'"
+        )])
+        compare(t.events, expected=[])
+
+    def test_error_target_changed(self):
+        def handle(event):
+            raise Exception('boom!')
+        errors = TestTarget()
+        s = Stack(handle, compiled=True)
+        s.error_target = errors
+        s('event')
+        compare(len(errors.events), expected=1)
+
+    def test_push_and_pop(self):
+        t1 = TestTarget(propagate=True)
+        t2 = TestTarget()
+        s = Stack(t2, compiled=True)
+        s.push(t1)
+        s('event 1')
+        s.pop()
+        s('event 2')
+        compare(t1.events, expected=['event 1'])
+        compare(t2.events, expected=['event 1', 'event 2'])
+
+    def test_capture(self):
+        t = TestTarget()
+        s = Stack(t, compiled=True)
+        with Capture(s) as capture:
+            s('event 1')
+        s('event 2')
+        compare(capture.events, expected=['event 1'])
+        compare(t.events, expected=['event 2'])
+
+    @benchmark
+    def test_faster(self):
+        targets = [lambda event: True] * 49 + [lambda event: None]
+        plain = Stack(*targets)
+        compiled = Stack(*targets, compiled=True)
+        plain_time, compiled_time = best_times(lambda: plain('event'),
+                                               lambda: compiled('event'))
+        assert compiled_time < plain_time, (compiled_time, plain_time)
+
+
 class TestLayer(object):
 
     def test_empty(self):
@@ -197,6 +342,19 @@ class TestLayer(object):
         result = l('event')
         assert result is None
 
+    def test_add_while_handling(self):
+        t = TestTarget()
+        l = Layer()
+
+        def add(event):
+            l.add(t)
+
+        l.add(add)
+        l('event 1')
+        compare(t.events, expected=[])
+        l('event 2')
+        compare(t.events, expected=['event 2'])
+
     def test_error_with_handler(self):
         e = Exception('boom!')
         def handle(event):
@@ -220,3 +378,98 @@ class TestLayer(object):
         l('event')
         # with a stack, we do keep going after an error:
         compare(t.events, expected=['event'])
+
+
+@pytest.mark.skipif(PY2, reason='concurrent.futures requires Python 3')
+class TestParallelLayer(object):
+
+    @pytest.fixture()
+    def executor(self):
+        from concurrent.futures import ThreadPoolExecutor
+        executor = ThreadPoolExecutor(max_workers=3)
+        yield executor
+        executor.shutdown()
+
+    def test_wait(self, executor):
+        from threading import Barrier
+        barrier = Barrier(3, timeout=5)
+        threads = []
+
+        def target(event):
+            # only passes if all three targets are running at once:
+            barrier.wait()
+            threads.append(current_thread())
+
+        l = Layer(target, target, target, executor=executor)
+        l('event')
+        compare(len(set(threads)), expected=3)
+
+    def test_propagate(self, executor):
+        t = TestTarget()
+        l = Layer(t, executor=executor, propagate=True)
+        result = l('event')
+        assert result == 'event'
+        compare(t.events, expected=['event'])
+
+    def test_no_wait(self, executor):
+        release = ThreadingEvent()
+        t = TestTarget()
+
+        def slow(event):
+            release.wait(5)
+            t(event)
+
+        l = Layer(slow, executor=executor, wait=False)
+        l('event')
+        compare(t.events, expected=[])
+        release.set()
+        executor.shutdown(wait=True)
+        compare(t.events, expected=['event'])
+
+    def test_error_isolation(self, executor):
+        e = Exception('boom!')
+
+        def handle(event):
+            raise e
+
+        errors = TestTarget()
+        t = TestTarget()
+        l = Layer(handle, t, error_target=errors, executor=executor)
+        l('event')
+        compare(errors.events, expected=[Event(
+            exc_info=(Exception, e, C(TracebackType)),
+            event="'event'"
+        )])
+        compare(t.events, expected=['event'])
+
+    def test_mutating_sibling(self, executor):
+        from threading import Barrier
+        barrier = Barrier(2, timeout=5)
+        seen = []
+
+        def remove(event):
+            barrier.wait()
+            del event['x']
+
+        def read(event):
+            barrier.wait()
+            seen.append(dict(event))
+
+        errors = TestTarget()
+        t = TestTarget()
+        event = Event(x=1, y=2)
+        s = Stack(Layer(remove, read, executor=executor, propagate=True,
+                        error_target=errors), t)
+        for i in range(20):
+            s(event)
+        compare(errors.events, expected=[])
+        compare(seen, expected=[{'x': 1, 'y': 2}] * 20)
+        compare(t.events, expected=[Event(x=1, y=2)] * 20)
+
+    def test_lazy_event_copied(self, executor):
+        t = TestTarget()
+        event = LazyEvent({'x': 1}, {'y': 2})
+        l = Layer(RemoveKeys('x'), t, executor=executor)
+        l(event)
+        compare(t.events, expected=[Event(x=1, y=2)])
+        compare(dict(event), expected={'x': 1, 'y': 2})
@@ -1,11 +1,17 @@
+from datetime import datetime
 from sys import exc_info
+from traceback import format_exception
 
 import pytest
 from pytz import timezone
-from testfixtures import StringComparison as S, compare, test_datetime, Replace
+from testfixtures import (
+    StringComparison as S, compare, test_datetime, Replace, ShouldRaise
+)
 
 from shoehorn.compat import PY3
-from shoehorn.targets.enrich import traceback, Timestamp, UTC
+from shoehorn.targets.enrich import (
+    traceback, CachedTraceback, Timestamp, UTC
+)
 
 
 class TestAddTimestamp(object):
@@ -37,6 +43,72 @@ class TestAddTimestamp(object):
         compare(event, expected={'timestamp': '2001-01-01 00:00'})
 
 
+class TestCachedTimestamp(object):
+
+    times = [978307200.0, 978307200.25, 978307200.000001, 978307200.999999,
+             978307201.5]
+
+    @pytest.fixture(autouse=True)
+    def time(self):
+        times = iter(self.times)
+        with Replace('shoehorn.targets.enrich.time', lambda: next(times)):
+            yield
+
+    def check(self, timestamp, format=None):
+        actual = [timestamp({})['timestamp'] for t in self.times]
+        expected = []
+        for t in self.times:
+            moment = datetime.fromtimestamp(t, timestamp.tz)
+            if format is None:
+                expected.append(moment.isoformat())
+            else:
+                expected.append(moment.strftime(format))
+        compare(actual, expected=expected)
+
+    def test_isoformat(self):
+        self.check(Timestamp(cached=True))
+
+    def test_utc(self):
+        self.check(Timestamp(tz=UTC(), cached=True))
+
+    def test_tzinfo(self):
+        self.check(Timestamp(tz=timezone('Australia/Canberra'), cached=True))
+
+    def test_format(self):
+        format = '%Y-%m-%d %H:%M:%S.%f %%f%%%f%z'
+        self.check(Timestamp(tz=UTC(), format=format, cached=True), format)
+
+    def test_format_without_microseconds(self):
+        format = '%Y-%m-%d %H:%M'
+        self.check(Timestamp(format=format, cached=True), format)
+
+    def test_only_formats_once_per_second(self):
+        timestamp = Timestamp(tz=UTC(), cached=True)
+        timestamp({})
+        parts = timestamp.cache[1]
+        for t in self.times[1:-1]:
+            timestamp({})
+            assert timestamp.cache[1] is parts
+        timestamp({})
+        compare(timestamp.cache, expected=(978307201, (
+            '2001-01-01T00:00:01', '+00:00'
+        )))
+
+
+class TestRawTimestamp(object):
+
+    def test_raw(self):
+        with Replace('shoehorn.targets.enrich.time', lambda: 978307200.5):
+            event = Timestamp(raw=True)({})
+        compare(event, expected={'timestamp': 978307200.5})
+
+    def test_raw_cannot_be_formatted(self):
+        with ShouldRaise(AssertionError(
+            'raw timestamps cannot have a timezone, format or be cached'
+        )):
+            Timestamp(raw=True, format='%Y')
+
+
 exception_with_traceback = S('(?s)^Traceback \(most recent call last\):'
                              '.+'
                              'Exception: boom!')
@@ -116,3 +188,111 @@ class TestExtractTraceback(object):
             pass
         event = traceback({})
         compare(event, expected={})
+
+
+def boom(message='boom!'):
+    raise Exception(message)
+
+
+def caught(function, *args):
+    try:
+        function(*args)
+    except Exception as e:
+        return e
+
+
+class TestCachedTraceback(object):
+
+    @pytest.fixture(autouse=True)
+    def calls(self):
+        calls = []
+
+        def counting_format_exception(*args):
+            calls.append(args)
+            return format_exception(*args)
+
+        with Replace('shoehorn.targets.enrich.format_exception',
+                     counting_format_exception):
+            yield calls
+
+    def test_same_as_uncached(self):
+        e = caught(boom)
+        compare(CachedTraceback()({'exception': e}),
+                expected=traceback({'exception': e}))
+
+    def test_formatted_once(self, calls):
+        target = CachedTraceback()
+        events = [target({'exception': caught(boom)}) for i in range(3)]
+        compare(events, expected=[events[0]] * 3)
+        compare(len(calls), expected=1)
+        compare(len(target.cache), expected=1)
+
+    def test_different_messages(self, calls):
+        target = CachedTraceback()
+        first = target({'exception': caught(boom, 'first')})
+        second = target({'exception': caught(boom, 'second')})
+        compare(first, expected={'traceback': S('(?s).+Exception: first$')})
+        compare(second, expected={'traceback': S('(?s).+Exception: second$')})
+        compare(len(calls), expected=2)
+
+    def test_different_code_paths(self, calls):
+        target = CachedTraceback()
+        target({'exception': caught(boom)})
+        target({'exception': caught(lambda: boom())})
+        compare(len(calls), expected=2)
+
+    def test_same_line(self, calls):
+        def add_firsts(a, b):
+            return a[0] + b[0]
+        target = CachedTraceback()
+        first = caught(add_firsts, [], [1])
+        second = caught(add_firsts, [1], [])
+        compare(target({'exception': first}),
+                expected=traceback({'exception': first}))
+        compare(target({'exception': second}),
+                expected=traceback({'exception': second}))
+        compare(len(target.cache), expected=2)
+
+    def test_no_traceback(self, calls):
+        target = CachedTraceback()
+        target({'exception': Exception('boom!')})
+        event = target({'exception': Exception('boom!')})
+        compare(event, expected={'traceback': 'Exception: boom!'})
+        compare(len(calls), expected=1)
+
+    @pytest.mark.skipif(not PY3, reason='exception chaining')
+    def test_chained(self, calls):
+        def chained(message):
+            try:
+                boom(message)
+            except Exception:
+                boom()
+        target = CachedTraceback()
+        first = target({'exception': caught(chained, 'first')})
+        second = target({'exception': caught(chained, 'second')})
+        compare(first, expected={'traceback': S('(?s).+first.+boom!$')})
+        compare(second, expected={'traceback': S('(?s).+second.+boom!$')})
+        compare(len(calls), expected=2)
+
+    def test_eviction(self, calls):
+        target = CachedTraceback(maxsize=2)
+        exceptions = [caught(boom, str(i)) for i in range(3)]
+        for e in exceptions[0], exceptions[1], exceptions[0], exceptions[2]:
+            target({'exception': e})
+        compare(len(calls), expected=3)
+        compare(len(target.cache), expected=2)
+        target({'exception': exceptions[0]})
+        compare(len(calls), expected=3)
+        target({'exception': exceptions[1]})
+        compare(len(calls), expected=4)
+
+    def test_stack(self):
+        target = CachedTraceback()
+        events = [target({'exc_info': True}) for i in range(2)]
+        compare(events, expected=[{
+            'traceback': S('(?s)^ *File.+parts = format_stack\(\)$')
+        }] * 2)
+        compare(len(target.cache), expected=1)
+
+    def test_exception_but_no_logging_wanted(self):
+        compare(CachedTraceback()({}), expected={})
@@ -1,7 +1,11 @@
-from testfixtures import compare
+from testfixtures import compare, ShouldRaise
 
 from shoehorn import Stack
-from shoehorn.targets.filter import RemoveKeys, RemoveKeysByPattern
+from shoehorn.event import Event, LazyEvent
+from shoehorn.targets.filter import (
+    RemoveKeys, RemoveKeysByPattern, compile_filter,
+    Level, Has, Equal, In, Match, Any
+)
 from shoehorn.testing import TestTarget
 
 
@@ -25,3 +29,108 @@ def test_remove_keys_pattern():
         s({'bad_foo': 'bar', 'bad_bar': 'baz', 'bob': 1})
         s({'bob': 2})
         compare(t.events, expected=[{'bob': 1}, {'bob': 2}])
+
+
+def test_remove_keys_pattern_in_place():
+        event = Event(bad_foo='bar', bob=1)
+        target = RemoveKeysByPattern('bad_')
+        assert target(event) is event
+        compare(event, expected=Event(bob=1))
+        event = Event(bob=2)
+        assert target(event) is event
+        compare(event, expected=Event(bob=2))
+        compare(target.decisions, expected={'bad_foo': True, 'bob': False})
+
+
+def test_remove_keys_pattern_lazy():
+        event = LazyEvent({'bad_context': 1, 'ok': 2}, {'bad_value': 3})
+        RemoveKeysByPattern('bad_')(event)
+        compare(dict(event), expected={'ok': 2})
+
+
+def test_remove_keys_pattern_decisions_bounded():
+        target = RemoveKeysByPattern('bad_', maxsize=2)
+        event = Event(a=1, bad_b=2, c=3)
+        target(event)
+        compare(event, expected=Event(a=1, c=3))
+        compare(target.decisions, expected={'a': False, 'bad_b': True})
+        target(Event(bad_d=4))
+        compare(target.decisions, expected={'a': False, 'bad_b': True})
+
+
+class TestCompiledFilter(object):
+
+    def check(self, *rules, **kw):
+        events = kw.pop('events')
+        expected = kw.pop('expected')
+        target = compile_filter(*rules)
+        compare([e for e in events if target(e) is e], expected=expected)
+
+    def test_level(self):
+        events = [Event(level='debug'), Event(level='warning'), Event(level=40),
+                  Event(), Event(level='yuhwut?')]
+        self.check(Level('warning'), events=events, expected=events[1:3])
+        self.check(Level(10), events=events, expected=events[:3])
+
+    def test_unknown_level(self):
+        with ShouldRaise(AssertionError("unknown level: 'yuhwut?'")):
+            Level('yuhwut?')
+
+    def test_has(self):
+        events = [Event(x=None), Event(y=1)]
+        self.check(Has('x'), events=events, expected=events[:1])
+
+    def test_equal(self):
+        events = [Event(x=1), Event(x=2), Event(y=1), Event(x=None)]
+        self.check(Equal('x', 1), events=events, expected=events[:1])
+        self.check(Equal('x', None), events=events, expected=events[3:])
+
+    def test_in(self):
+        events = [Event(x=1), Event(x=2), Event(x=3), Event()]
+        self.check(In('x', [1, 3]), events=events,
+                   expected=[events[0], events[2]])
+
+    def test_in_unhashable(self):
+        events = [Event(x=[1]), Event(x={'a': 1}), Event(x=1)]
+        self.check(In('x', [1, 2]), events=events, expected=events[2:])
+
+    def test_match(self):
+        events = [Event(x='foo bar'), Event(x='baz'), Event(x=1), Event()]
+        self.check(Match('x', 'ba[r]'), events=events, expected=events[:1])
+
+    def test_combinators(self):
+        events = [Event(level='error', x=1), Event(level='info', x=1),
+                  Event(level='info', x=2), Event(level='error', x=2)]
+        self.check(Level('error') & Equal('x', 1), events=events,
+                   expected=events[:1])
+        self.check(Level('error') | Equal('x', 1), events=events,
+                   expected=[events[0], events[1], events[3]])
+        self.check(~Level('error'), events=events, expected=events[1:3])
+        self.check(Level('error'), ~Equal('x', 1), events=events,
+                   expected=events[3:])
+
+    def test_empty(self):
+        events = [Event(x=1)]
+        self.check(events=events, expected=events)
+        self.check(Any(), events=events, expected=[])
+
+    def test_source(self):
+        target = compile_filter(Level('info') & ~Has('x'))
+        compare(target.source, expected=(
+            'def filter(event):\n'
+            '    get = event.get\n'
+            "    if ((level_number(get('level'), -1) >= 20 and "
+            "(not _2 in event))):\n"
+            '        return event'
+        ))
+
+    def test_in_stack(self):
+        t = TestTarget()
+        s = Stack(compile_filter(Level('warning')), RemoveKeys('x'), t)
+        s(Event(level='info', x=1))
+        s(Event(level='error', x=2))
+        compare(t.events, expected=[Event(level='error')])
+
+    def test_lazy_event(self):
+        event = LazyEvent({'x': 1}, {'level': 'error'})
+        assert compile_filter(Level('error') & Equal('x', 1))(event) is event
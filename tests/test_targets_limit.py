@@ -0,0 +1,334 @@
+from threading import Thread
+from time import sleep
+
+import pytest
+from testfixtures import compare, Replace, ShouldRaise
+
+from shoehorn import Stack
+from shoehorn.event import Event
+from shoehorn.targets.limit import (
+    Sample, HashSample, RateLimit, Deduplicate
+)
+from shoehorn.testing import TestTarget
+
+
+def summary(limiter, suppressed):
+    return Event((
+        ('level', 'warning'),
+        ('message', 'events suppressed'),
+        ('limiter', limiter),
+        ('suppressed', suppressed),
+    ))
+
+
+class TestSample(object):
+
+    def test_sample(self):
+        randoms = iter([0.1, 0.5, 0.2, 0.9])
+        summaries = TestTarget()
+        target = Sample(0.3, summary_target=summaries)
+        with Replace('shoehorn.targets.limit.random', lambda: next(randoms)):
+            kept = [target(Event(x=i)) for i in range(4)]
+        compare(kept, expected=[Event(x=0), None, Event(x=2), None])
+        compare(target.suppressed, expected=2)
+        target.flush()
+        compare(summaries.events, expected=[summary('Sample', 2)])
+        compare(target.suppressed, expected=0)
+
+    def test_in_stack(self):
+        t = TestTarget()
+        s = Stack(Sample(0), t)
+        s(Event(x=1))
+        compare(t.events, expected=[])
+        s = Stack(Sample(1), t)
+        s(Event(x=1))
+        compare(t.events, expected=[Event(x=1)])
+
+    def test_periodic_summary(self):
+        summaries = TestTarget()
+        target = Sample(0, summary_target=summaries, interval=0.01)
+        target(Event(x=1))
+        target(Event(x=2))
+        compare(summaries.events, expected=[])
+        sleep(0.1)
+        compare(summaries.events, expected=[summary('Sample', 2)])
+        assert target.timer is None
+
+    def test_no_summary_target(self):
+        target = Sample(0)
+        target(Event(x=1))
+        assert target.timer is None
+        target.close()
+        compare(target.suppressed, expected=0)
+
+    def test_nothing_suppressed(self):
+        summaries = TestTarget()
+        target = Sample(1, summary_target=summaries)
+        target(Event(x=1))
+        target.close()
+        compare(summaries.events, expected=[])
+
+
+class TestHashSample(object):
+
+    def test_requests_kept_together(self):
+        target = HashSample('request_id', 0.5)
+        kept = {}
+        for i in range(3):
+            for request_id in range(100):
+                result = target(Event(request_id=request_id, i=i))
+                kept.setdefault(request_id, set()).add(result is not None)
+        assert all(len(results) == 1 for results in kept.values())
+        total = sum(1 for results in kept.values() if True in results)
+        assert 30 < total < 70, total
+        compare(target.suppressed, expected=(100 - total) * 3)
+
+    def test_text_and_bytes_the_same(self):
+        target = HashSample('request_id', 0.5)
+        for i in range(100):
+            compare(target(Event(request_id=str(i))) is None,
+                    expected=target(Event(request_id=str(i).encode('ascii')))
+                    is None)
+
+    def test_no_key(self):
+        target = HashSample('request_id', 0)
+        compare(target(Event(x=1)), expected=Event(x=1))
+        compare(target(Event(request_id=1)), expected=None)
+
+    def test_summary(self):
+        summaries = TestTarget()
+        target = HashSample('request_id', 0, summary_target=summaries)
+        target(Event(request_id=1))
+        target.close()
+        compare(summaries.events, expected=[summary('HashSample', 1)])
+
+
+class TestRateLimit(object):
+
+    def check(self, target, times, events):
+        times = iter(times)
+        with Replace('shoehorn.targets.limit.clock', lambda: next(times)):
+            return [target(event) is not None for event in events]
+
+    def test_rate(self):
+        target = RateLimit(2)
+        compare(self.check(target, [0, 0, 0, 0.4, 0.5, 1.5, 1.5, 1.5],
+                           [Event()] * 8),
+                expected=[True, True, False, False, True, True, True, False])
+        compare(target.suppressed, expected=3)
+
+    def test_burst(self):
+        target = RateLimit(1, burst=3)
+        compare(self.check(target, [0, 0, 0, 0, 1], [Event()] * 5),
+                expected=[True, True, True, False, True])
+
+    def test_fractional_rate(self):
+        target = RateLimit(0.5)
+        compare(self.check(target, [0, 0, 1, 2, 2, 1000],
+                           [Event()] * 6),
+                expected=[True, False, False, True, False, True])
+
+    def test_burst_too_small(self):
+        with ShouldRaise(AssertionError('burst must be at least 1')):
+            RateLimit(0.5, burst=0.5)
+
+    def test_per_key(self):
+        target = RateLimit(1, key='user')
+        compare(self.check(target, [0, 0, 0, 0, 0],
+                           [Event(user='a'), Event(user='a'), Event(user='b'),
+                            Event(), Event()]),
+                expected=[True, False, True, True, False])
+        compare(sorted(target.buckets, key=str), expected=[None, 'a', 'b'])
+
+    def test_maxsize(self):
+        target = RateLimit(1, key='user', maxsize=2)
+        compare(self.check(target, [0, 0, 0, 0],
+                           [Event(user='a'), Event(user='b'),
+                            Event(user='c'), Event(user='a')]),
+                expected=[True, True, True, True])
+        compare(list(target.buckets), expected=['c', 'a'])
+
+    def test_maxsize_least_recently_used(self):
+        target = RateLimit(1, key='user', maxsize=2)
+        compare(self.check(target, [0, 0, 0, 0, 0],
+                           [Event(user='a'), Event(user='b'), Event(user='a'),
+                            Event(user='c'), Event(user='a')]),
+                expected=[True, True, False, True, False])
+        compare(list(target.buckets), expected=['c', 'a'])
+
+    def test_summary(self):
+        summaries = TestTarget()
+        target = RateLimit(1, summary_target=summaries)
+        self.check(target, [0, 0, 0], [Event()] * 3)
+        target.close()
+        compare(summaries.events, expected=[summary('RateLimit', 2)])
+
+
+class TestDeduplicate(object):
+
+    @pytest.fixture(autouse=True)
+    def clock(self):
+        times = [0]
+        with Replace('shoehorn.targets.limit.clock', lambda: times[0]):
+            yield times
+
+    def test_repeats_suppressed(self, clock):
+        summaries = TestTarget()
+        target = Deduplicate(summary_target=summaries)
+        event = Event(level='error', message='boom', args=(1, ), x=1)
+        compare(target(event), expected=event)
+        clock[0] = 5
+        compare(target(Event(event, x=2)), expected=None)
+        compare(target(Event(event, x=3)), expected=None)
+        compare(target(Event(event, args=(2, ))), expected=Event(event, args=(2, )))
+        compare(summaries.events, expected=[])
+        compare(target.suppressed, expected=2)
+        target.flush()
+        compare(summaries.events, expected=[
+            Event(level='error', message='boom', args=(1, ), repeats=2)
+        ])
+        compare(target.windows, expected={})
+        compare(target.suppressed, expected=0)
+
+    def test_window_closes(self, clock):
+        summaries = TestTarget()
+        target = Deduplicate(keys=('message', ), window=10,
+                             summary_target=summaries)
+        target(Event(message='boom'))
+        target(Event(message='boom'))
+        clock[0] = 10
+        compare(target(Event(message='boom', x=1)),
+                expected=Event(message='boom', x=1))
+        compare(summaries.events, expected=[Event(message='boom', repeats=1)])
+        target.flush()
+        compare(summaries.events, expected=[Event(message='boom', repeats=1)])
+
+    def test_timer_closes_expired_windows(self, clock):
+        summaries = TestTarget()
+        target = Deduplicate(keys=('message', ), window=10,
+                             summary_target=summaries)
+        target(Event(message='a'))
+        target(Event(message='a'))
+        clock[0] = 5
+        target(Event(message='b'))
+        target(Event(message='b'))
+        target(Event(message='c'))
+        clock[0] = 10
+        target.on_timer()
+        compare(summaries.events, expected=[Event(message='a', repeats=1)])
+        compare(sorted(target.windows), expected=[('b', ), ('c', )])
+        compare(target.suppressed, expected=1)
+        assert target.timer is not None
+        clock[0] = 15
+        target.on_timer()
+        compare(summaries.events, expected=[
+            Event(message='a', repeats=1), Event(message='b', repeats=1)
+        ])
+        compare(target.windows, expected={})
+        compare(target.suppressed, expected=0)
+        assert target.timer is None
+
+    def test_timer_due_at_expiry(self, clock):
+        timers = []
+
+        class RecordingTimer(object):
+            def __init__(self, interval, function):
+                self.interval = interval
+                self.cancelled = False
+                timers.append(self)
+
+            def start(self):
+                pass
+
+            def cancel(self):
+                self.cancelled = True
+
+        target = Deduplicate(keys=('message', ), window=10,
+                             summary_target=TestTarget())
+        with Replace('shoehorn.targets.limit.Timer', RecordingTimer):
+            target(Event(message='a'))
+            clock[0] = 5
+            target(Event(message='b'))
+            clock[0] = 6
+            target(Event(message='b'))
+            compare([t.interval for t in timers], expected=[9])
+            clock[0] = 7
+            # a's window closes before b's:
+            target(Event(message='a'))
+            compare([t.interval for t in timers], expected=[9, 3])
+            assert timers[0].cancelled
+            clock[0] = 8
+            target(Event(message='b'))
+            compare(len(timers), expected=2)
+            clock[0] = 10
+            target.on_timer()
+            # b's window closes 5 seconds later:
+            compare([t.interval for t in timers], expected=[9, 3, 5])
+            compare(target.suppressed, expected=2)
+
+    def test_timer(self, clock):
+        summaries = TestTarget()
+        target = Deduplicate(keys=('message', ), window=0.01,
+                             summary_target=summaries)
+        target(Event(message='boom'))
+        target(Event(message='boom'))
+        clock[0] = 1
+        sleep(0.1)
+        compare(summaries.events, expected=[Event(message='boom', repeats=1)])
+
+    def test_unhashable_values(self, clock):
+        target = Deduplicate(keys=('message', 'args'))
+        event = Event(message='boom', args=([1], ))
+        compare(target(event), expected=event)
+        compare(target(Event(event)), expected=None)
+
+    def test_maxsize(self, clock):
+        summaries = TestTarget()
+        target = Deduplicate(keys=('message', ), maxsize=2,
+                             summary_target=summaries)
+        for message in 'a', 'a', 'b', 'c', 'c':
+            target(Event(message=message))
+        compare(summaries.events, expected=[Event(message='a', repeats=1)])
+        compare(sorted(target.windows), expected=[('c', )])
+        compare(target.windows[('c', )][1], expected=1)
+
+    def test_threads(self, clock):
+        summaries = TestTarget()
+        target = Deduplicate(summary_target=summaries)
+        passed = []
+
+        def log():
+            for i in range(500):
+                if target(Event(message='boom')) is not None:
+                    passed.append(i)
+
+        threads = [Thread(target=log) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        compare(len(passed), expected=1)
+        compare(target.suppressed, expected=3999)
+        target.flush()
+        compare(summaries.events,
+                expected=[Event(message='boom', repeats=3999)])
+
+    def test_suppressed_summary(self, clock):
+        # the Limiter summary is still available with its usual signature:
+        target = Deduplicate()
+        compare(target.summary(2), expected=summary('Deduplicate', 2))
+
+    def test_no_summary_target(self, clock):
+        target = Deduplicate()
+        target(Event(message='boom'))
+        target(Event(message='boom'))
+        assert target.timer is None
+        target.close()
+        compare(target.windows, expected={})
+
+    def test_in_stack(self, clock):
+        t = TestTarget()
+        s = Stack(Deduplicate(), t)
+        s(Event(message='boom'))
+        s(Event(message='boom'))
+        compare(t.events, expected=[Event(message='boom')])
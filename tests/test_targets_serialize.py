@@ -1,14 +1,29 @@
-from datetime import datetime
-from io import StringIO, open as io_open
-from json import dumps as stdlib_dumps
+from datetime import date, datetime, time
+from decimal import Decimal
+from io import BytesIO, StringIO, open as io_open
+from json import dumps as stdlib_dumps, loads as json_loads
+from subprocess import check_call
+from textwrap import dedent
+from uuid import UUID
+import os
+import re
+import sys
 
 import pytest
-from testfixtures import compare, Replace, ShouldRaise
-
-from shoehorn.compat import PY2
-from shoehorn.event import Event
-from shoehorn.targets.serialize import JSON, LTSV, Human, dumps
-from .common import run_in_ascii
+from testfixtures import (
+    compare, not_there, Replace, Replacer, ShouldRaise
+)
+
+from shoehorn import Logger, Stack
+from shoehorn.compat import PY2, Unicode
+from shoehorn.event import Event, LazyEvent
+from shoehorn.targets.compose import Layer
+from shoehorn.targets.enrich import Timestamp, UTC
+from shoehorn.targets.filter import RemoveKeys
+from shoehorn.targets.serialize import (
+    JSON, LTSV, Human, BinaryJSON, RawStream, Tee, dumps, raw_stream
+)
+from .common import benchmark, best_times, run_in_ascii
 
 
 class TestStreams(object):
@@ -45,6 +60,12 @@ class TestJSON(object):
         target(Event(x=1))
         self.check_json(stream.getvalue(), expected=u'{"x":1}')
 
+    def test_lazy(self):
+        stream = StringIO()
+        target = JSON(stream)
+        target(LazyEvent(Event(x=1), dict(y=2)))
+        self.check_json(stream.getvalue(), expected=u'{"x":1,"y":2}')
+
     def test_mixed_unicode_byte_values(self):
         stream = StringIO()
         target = JSON(stream)
@@ -162,6 +183,50 @@ class TestLTSV(object):
         compare(stream.getvalue(),
                 expected='label: \titem: \tline: \n')
 
+    def test_separators_in_numbers(self):
+        stream = StringIO()
+        target = LTSV(stream, label_sep='=', item_sep='.')
+        target(Event((('x', 1), ('y', 1.5), ('z', -1e100), ('n', u'1.5'))))
+        compare(stream.getvalue(), expected='x=1.y=1 5.z=-1e+100.n=1 5\n')
+
+    def test_number_subclasses(self):
+        stream = StringIO()
+        target = LTSV(stream)
+        target(Event((('x', True), ('y', None))))
+        compare(stream.getvalue(), expected='x:True\ty:None\n')
+
+    def regex_quote(self):
+        # how values were quoted before translation tables were used:
+        sub = re.compile('[\n\r:\t]').sub
+
+        def quote(item):
+            try:
+                item = Unicode(item)
+            except UnicodeDecodeError:
+                item = repr(item)
+            return sub(' ', item)
+
+        return quote
+
+    quote_values = [1, 2.5, u'some text', u'a:b', datetime(2001, 1, 1), None]
+
+    def test_quote_same_as_regex(self):
+        regex_quote = self.regex_quote()
+        quote = LTSV(StringIO()).quote
+        compare([quote(v) for v in self.quote_values],
+                expected=[regex_quote(v) for v in self.quote_values])
+
+    @benchmark
+    def test_quote_faster(self):
+        regex_quote = self.regex_quote()
+        quote = LTSV(StringIO()).quote
+        values = self.quote_values
+        regex_time, quote_time = best_times(
+            lambda: [regex_quote(v) for v in values],
+            lambda: [quote(v) for v in values],
+        )
+        assert quote_time < regex_time, (quote_time, regex_time)
+
     def test_bad_encoding(self, dir):
         run_in_ascii(dir, """
         from shoehorn.event import Event
@@ -259,6 +324,36 @@ class TestHuman(object):
             target(Event())
         compare(stream.getvalue(), expected='')
 
+    def test_prefix_literal_braces_and_conversions(self):
+        stream = StringIO()
+        target = Human(stream, prefix='{{{x!s:>3}}} {y!r}: ')
+        target(Event(x=1, y='2', z=3))
+        compare(stream.getvalue(), expected="{  1} '2': z=3\n")
+
+    def test_prefix_nested_spec(self):
+        stream = StringIO()
+        target = Human(stream, prefix='{level:>{width}} ')
+        target(Event(level='info', width=8, x=1))
+        target(Event(level='info', x=1))
+        compare(stream.getvalue(), expected="    info x=1\ninfo x=1\n")
+
+    def test_prefix_nested_spec_conversion(self):
+        stream = StringIO()
+        target = Human(stream, prefix='{x!r:{fill}^{width!s}}: ')
+        target(Event(x='a', fill='*', width=7, y=1))
+        compare(stream.getvalue(), expected="**'a'**: y=1\n")
+
+    def test_prefix_only(self):
+        stream = StringIO()
+        target = Human(stream, prefix='{x}-{y}: ', only={'y', 'z'})
+        target(Event(x=1, y=2, z=3))
+        compare(stream.getvalue(), expected="-2: z=3\n")
+
+    def test_prefix_compiled_once(self):
+        target = Human(StringIO(), prefix='{x}: ')
+        with Replace('shoehorn.targets.serialize.Formatter', None):
+            target(Event(x=1))
+
     def test_ignore(self):
         stream = StringIO()
         target = Human(stream, ignore={'z'})
@@ -324,3 +419,595 @@ class TestHuman(object):
         target.close()
         compare(dir.read('test.log', encoding='utf-8'),
                 expected='{}\nx=1\n')
+
+
+class FlushCountingStream(StringIO):
+
+    flushes = 0
+
+    def flush(self):
+        self.flushes += 1
+        super(FlushCountingStream, self).flush()
+
+
+class CountingHuman(Human):
+
+    renders = 0
+
+    def render_event(self, event):
+        CountingHuman.renders += 1
+        return super(CountingHuman, self).render_event(event)
+
+
+class BrokenStream(StringIO):
+
+    def write(self, text):
+        raise Exception('boom')
+
+
+class TestTee(object):
+
+    def test_same_format_rendered_once(self):
+        streams = StringIO(), StringIO(), StringIO()
+        with Replace('tests.test_targets_serialize.CountingHuman.renders', 0):
+            target = Tee(*(CountingHuman(s) for s in streams))
+            target(Event(x=1))
+            target(Event(x=2))
+            compare(CountingHuman.renders, expected=2)
+        for stream in streams:
+            compare(stream.getvalue(), expected='x=1\nx=2\n')
+
+    def test_different_formats(self):
+        streams = StringIO(), StringIO(), StringIO(), StringIO()
+        target = Tee(JSON(streams[0]), LTSV(streams[1]),
+                     Human(streams[2]), Human(streams[3], prefix='{x}: '))
+        target(Event(x=1, y=2))
+        compare([s.getvalue() for s in streams], expected=[
+            dumps(Event(x=1, y=2)), 'x:1\ty:2\n', 'x=1, y=2\n', '1: y=2\n'
+        ])
+
+    def test_lazy_event(self):
+        streams = StringIO(), StringIO()
+        logger = Logger(Tee(Human(streams[0]), Human(streams[1])), lazy=True)
+        logger.bind(x=1).info('foo')
+        for stream in streams:
+            compare(stream.getvalue(),
+                    expected="x=1, level='info', message='foo'\n")
+
+    def test_buffering_per_serializer(self):
+        buffered, unbuffered = StringIO(), StringIO()
+        target = Tee(Human(buffered, buffer_size=1000), Human(unbuffered))
+        target(Event(x=1))
+        compare(buffered.getvalue(), expected='')
+        compare(unbuffered.getvalue(), expected='x=1\n')
+        target(Event(x=2, level='error'))
+        compare(buffered.getvalue(), expected="x=1\nx=2, level='error'\n")
+        target(Event(x=3))
+        target.flush()
+        compare(buffered.getvalue(), expected=unbuffered.getvalue())
+
+    def test_error_in_one_serializer(self):
+        errors = []
+        stream = StringIO()
+        target = Tee(Human(BrokenStream()), Human(stream),
+                     error_target=errors.append)
+        target(Event(x=1))
+        compare(stream.getvalue(), expected='x=1\n')
+        compare(len(errors), expected=1)
+        compare(errors[0]['event'], expected='Event(x=1)')
+
+    def test_close(self):
+        streams = StringIO(), StringIO()
+        target = Tee(Human(streams[0], buffer_size=1000), Human(streams[1]))
+        target(Event(x=1))
+        target.close()
+        for stream in streams:
+            assert stream.closed
+
+
+class TestTimestamps(object):
+
+    # 2001-01-01 00:00:00.5 UTC
+    timestamp = 978307200.5
+
+    def test_formatted(self):
+        stream = StringIO()
+        target = Human(stream, timestamp_keys=['timestamp'], tz=UTC())
+        event = Event(timestamp=self.timestamp, x=1)
+        target(event)
+        compare(stream.getvalue(),
+                expected="timestamp='2001-01-01T00:00:00.500000+00:00', x=1\n")
+        compare(event, expected=Event(timestamp=self.timestamp, x=1))
+
+    def test_time_format(self):
+        stream = StringIO()
+        target = LTSV(stream, timestamp_keys=['start', 'end'],
+                      time_format='%H-%M-%S.%f', tz=UTC())
+        target(Event(start=self.timestamp, end=self.timestamp + 1, x=1))
+        compare(stream.getvalue(),
+                expected='start:00-00-00.500000\tend:00-00-01.500000\tx:1\n')
+
+    def test_json(self):
+        stream = StringIO()
+        target = JSON(stream, timestamp_keys=['timestamp'], tz=UTC())
+        target(Event(timestamp=self.timestamp))
+        compare(json_loads(stream.getvalue()),
+                expected={'timestamp': '2001-01-01T00:00:00.500000+00:00'})
+
+    def test_not_float(self):
+        stream = StringIO()
+        target = Human(stream, timestamp_keys=['timestamp'])
+        target(Event(timestamp='already formatted', x=None))
+        compare(stream.getvalue(),
+                expected="timestamp='already formatted', x=None\n")
+
+    def test_from_raw_enricher(self):
+        stream = StringIO()
+        target = Human(stream, timestamp_keys=['timestamp'], tz=UTC())
+        stack = Stack(Timestamp(raw=True), target)
+        with Replace('shoehorn.targets.enrich.time', lambda: self.timestamp):
+            stack(Event(x=1))
+        compare(stream.getvalue(),
+                expected="x=1, timestamp='2001-01-01T00:00:00.500000+00:00'\n")
+
+    def test_lazy_event_bound_context_cached(self):
+        stream = StringIO()
+        target = Human(stream, timestamp_keys=['timestamp'], tz=UTC())
+        logger = Logger(Stack(Timestamp(raw=True), target), lazy=True)
+        logger = logger.bind(x=1)
+        with Replace('shoehorn.targets.enrich.time', lambda: self.timestamp):
+            logger.info('a')
+            logger.info('b')
+        compare(stream.getvalue(), expected=(
+            "x=1, level='info', message='a', "
+            "timestamp='2001-01-01T00:00:00.500000+00:00'\n"
+            "x=1, level='info', message='b', "
+            "timestamp='2001-01-01T00:00:00.500000+00:00'\n"
+        ))
+        compare(list(logger.context._rendered),
+                expected=[(Human, target.format_key)])
+
+    def test_in_bound_context(self):
+        stream = StringIO()
+        target = Human(stream, timestamp_keys=['started'], tz=UTC())
+        logger = Logger(target, lazy=True).bind(started=self.timestamp)
+        logger.info('a')
+        compare(stream.getvalue(), expected=(
+            "started='2001-01-01T00:00:00.500000+00:00', "
+            "level='info', message='a'\n"
+        ))
+
+    def test_tee_groups_by_timestamp_format(self):
+        streams = StringIO(), StringIO()
+        target = Tee(Human(streams[0]),
+                     Human(streams[1], timestamp_keys=['t'], tz=UTC()))
+        target(Event(t=self.timestamp))
+        compare([s.getvalue() for s in streams], expected=[
+            't=978307200.5\n', "t='2001-01-01T00:00:00.500000+00:00'\n"
+        ])
+
+
+class TestBuffering(object):
+
+    def test_unbuffered(self):
+        stream = FlushCountingStream()
+        target = LTSV(stream)
+        target(Event(x=1))
+        target(Event(x=2))
+        compare(stream.getvalue(), expected='x:1\nx:2\n')
+        compare(stream.flushes, expected=2)
+
+    def test_buffer_size(self):
+        stream = FlushCountingStream()
+        target = LTSV(stream, buffer_size=10)
+        target(Event(x=1))
+        target(Event(x=2))
+        compare(stream.getvalue(), expected='')
+        target(Event(x=3))
+        compare(stream.getvalue(), expected='x:1\nx:2\nx:3\n')
+        compare(stream.flushes, expected=1)
+        target(Event(x=4))
+        compare(stream.getvalue(), expected='x:1\nx:2\nx:3\n')
+
+    def test_flush_level(self):
+        stream = StringIO()
+        target = LTSV(stream, buffer_size=1000)
+        target(Event(x=1, level='warning'))
+        compare(stream.getvalue(), expected='')
+        target(Event(x=2, level='error'))
+        compare(stream.getvalue(),
+                expected='x:1\tlevel:warning\nx:2\tlevel:error\n')
+        target(Event(x=3, level=50))
+        compare(stream.getvalue(),
+                expected='x:1\tlevel:warning\nx:2\tlevel:error\n'
+                         'x:3\tlevel:50\n')
+
+    def test_custom_flush_level(self):
+        stream = StringIO()
+        target = LTSV(stream, buffer_size=1000, flush_level='warning')
+        target(Event(x=1, level='info'))
+        target(Event(x=2, level='warning'))
+        compare(stream.getvalue(),
+                expected='x:1\tlevel:info\nx:2\tlevel:warning\n')
+
+    def test_no_flush_level(self):
+        stream = StringIO()
+        target = LTSV(stream, buffer_size=1000, flush_level=None)
+        target(Event(x=1, level='critical'))
+        compare(stream.getvalue(), expected='')
+
+    def test_flush_interval(self):
+        stream = FlushCountingStream()
+        target = Human(stream, flush_interval=0.01)
+        target(Event(x=1))
+        target(Event(x=2))
+        compare(stream.getvalue(), expected='')
+        timer = target.timer
+        timer.join(5)
+        compare(stream.getvalue(), expected='x=1\nx=2\n')
+        compare(stream.flushes, expected=1)
+        assert target.timer is None
+
+    def test_explicit_flush_cancels_timer(self):
+        stream = StringIO()
+        target = Human(stream, flush_interval=60)
+        target(Event(x=1))
+        timer = target.timer
+        target.flush()
+        compare(stream.getvalue(), expected='x=1\n')
+        assert target.timer is None
+        timer.join(5)
+        assert not timer.is_alive()
+
+    def test_late_timer_does_nothing(self):
+        stream = FlushCountingStream()
+        target = Human(stream, flush_interval=60)
+        target._flush_on_timer()
+        compare(stream.flushes, expected=0)
+
+    def test_close_flushes(self, dir):
+        target = JSON(dir.getpath('test.log'), buffer_size=1000)
+        target(Event(x=1))
+        compare(dir.read('test.log'), expected=b'')
+        target.close()
+        TestJSON().check_json(dir.read('test.log'), expected=u'{"x":1}')
+
+    def test_at_exit(self):
+        registered = []
+        with Replacer() as r:
+            r.replace('atexit.register', registered.append)
+            r.replace('atexit.unregister', registered.remove)
+            target = Human(StringIO(), buffer_size=1000)
+            compare(registered, expected=[target.flush])
+            target.close()
+            compare(registered, expected=[])
+
+    def test_at_exit_not_buffered(self):
+        registered = []
+        with Replace('atexit.register', registered.append):
+            Human(StringIO())
+            Human(StringIO(), buffer_size=1000, flush_at_exit=False)
+        compare(registered, expected=[])
+
+    def test_flushed_at_exit(self, dir):
+        path = dir.write('test.py', encoding='utf-8', data=dedent('''
+            import sys
+            from shoehorn import Logger
+            from shoehorn.targets.serialize import Human
+            logger = Logger(Human(sys.argv[1], buffer_size=10000,
+                                  flush_interval=5))
+            logger.warning('foo')
+            logger.info('bar')
+        '''))
+        check_call([sys.executable, path, dir.getpath('test.log')])
+        compare(dir.read('test.log', encoding='utf-8'),
+                expected="level='warning', message='foo'\n"
+                         "level='info', message='bar'\n")
+
+
+class TestBoundContext(object):
+
+    def check(self, serializer_type, expected, **kw):
+        lazy_stream, eager_stream = StringIO(), StringIO()
+        lazy_target = serializer_type(lazy_stream, **kw)
+        eager_target = serializer_type(eager_stream, **kw)
+        calls = []
+        render_bound = lazy_target.render_bound
+
+        def counting_render_bound(context):
+            calls.append(context)
+            return render_bound(context)
+
+        lazy_target.render_bound = counting_render_bound
+        lazy = Logger(lazy_target, lazy=True).bind_ordered(
+            ('x', 1), ('multi', 'a\nb'), ('y', 'foo')
+        )
+        eager = Logger(eager_target).bind_ordered(
+            ('x', 1), ('multi', 'a\nb'), ('y', 'foo')
+        )
+        for logger in lazy, eager:
+            logger.info('first', z=2)
+            logger.log_ordered('error', ('z', 3), ('text', 'c\nd'))
+        compare(lazy_stream.getvalue(), expected=eager_stream.getvalue())
+        compare(lazy_stream.getvalue().replace(' ', ''), expected=expected)
+        compare(len(calls), expected=1)
+
+    def test_json(self):
+        self.check(JSON, expected=(
+            '{"x":1,"multi":"a\\nb","y":"foo","z":2,'
+            '"level":"info","message":"first"}'
+            '{"x":1,"multi":"a\\nb","y":"foo","z":3,'
+            '"text":"c\\nd","level":"error"}'
+        ))
+
+    def test_ltsv(self):
+        self.check(LTSV, expected=(
+            'x:1\tmulti:ab\ty:foo\tz:2\tlevel:info\tmessage:first\n'
+            'x:1\tmulti:ab\ty:foo\tz:3\ttext:cd\tlevel:error\n'
+        ))
+
+    def test_human(self):
+        self.check(Human, prefix='{level} {y}: ', ignore={'x'}, expected=(
+            "infofoo:z=2,message='first'\n"
+            "multi:\na\nb\n"
+            "errorfoo:z=3\n"
+            "multi:\na\nb\n"
+            "text:\nc\nd\n"
+        ))
+
+    def test_human_only(self):
+        self.check(Human, prefix='{level} {x}: ', only={'multi', 'z'},
+                   expected=(
+            ":z=2\n"
+            "multi:\na\nb\n"
+            ":z=3\n"
+            "multi:\na\nb\n"
+        ))
+
+    def test_different_formats_cached_separately(self):
+        ltsv_stream, human_stream = StringIO(), StringIO()
+        ltsv, human = LTSV(ltsv_stream), Human(human_stream)
+        logger = Logger(Layer(ltsv, human), lazy=True).bind(x=1)
+        logger.info('foo')
+        logger.info('bar')
+        compare(ltsv_stream.getvalue(),
+                expected='x:1\tlevel:info\tmessage:foo\n'
+                         'x:1\tlevel:info\tmessage:bar\n')
+        compare(human_stream.getvalue(),
+                expected="x=1, level='info', message='foo'\n"
+                         "x=1, level='info', message='bar'\n")
+        compare(logger.context._rendered, expected={
+            (LTSV, ltsv.format_key): 'x:1',
+            (Human, human.format_key): ('x=1', ''),
+        })
+
+    def test_subclasses_cached_separately(self):
+        class UpperLTSV(LTSV):
+            def quote(self, item):
+                return super(UpperLTSV, self).quote(item).upper()
+
+        plain_stream, upper_stream = StringIO(), StringIO()
+        logger = Logger(Layer(LTSV(plain_stream), UpperLTSV(upper_stream)),
+                        lazy=True).bind(x='a')
+        logger.info('foo')
+        logger.info('bar')
+        compare(plain_stream.getvalue(),
+                expected='x:a\tlevel:info\tmessage:foo\n'
+                         'x:a\tlevel:info\tmessage:bar\n')
+        compare(upper_stream.getvalue(),
+                expected='x:A\tlevel:INFO\tmessage:FOO\n'
+                         'x:A\tlevel:INFO\tmessage:BAR\n')
+
+    def test_value_overrides_bound(self):
+        stream = StringIO()
+        logger = Logger(LTSV(stream), lazy=True).bind(x=1, y=2)
+        logger.info(x=3)
+        compare(stream.getvalue(), expected='x:3\ty:2\tlevel:info\n')
+        assert logger.context._rendered is None
+
+    def test_materialized(self):
+        stream = StringIO()
+        target = LTSV(stream)
+        logger = Logger(Stack(RemoveKeys('x'), target), lazy=True).bind(
+            x=1, y=2
+        )
+        logger.info()
+        compare(stream.getvalue(), expected='y:2\tlevel:info\n')
+        assert logger.context._rendered is None
+
+    def test_values_added_by_targets(self):
+        stream = StringIO()
+
+        def enrich(event):
+            event['added'] = True
+            return event
+
+        logger = Logger(Stack(enrich, LTSV(stream)), lazy=True).bind(x=1)
+        logger.info()
+        compare(stream.getvalue(), expected='x:1\tlevel:info\tadded:True\n')
+        assert logger.context._rendered is not None
+
+    def test_empty_bound(self):
+        stream = StringIO()
+        Logger(JSON(stream), lazy=True).info(x=1)
+        TestJSON().check_json(stream.getvalue(),
+                              expected='{"x":1,"level":"info"}')
+
+
+class TestBinaryJSON(object):
+
+    def test_simple(self):
+        stream = BytesIO()
+        target = BinaryJSON(stream)
+        target(Event((('x', 1), ('y', u'\u00A3'))))
+        target(Event(x=2))
+        compare(stream.getvalue(),
+                expected=b'{"x":1,"y":"\\u00a3"}\n{"x":2}\n')
+
+    def test_types(self):
+        stream = BytesIO()
+        target = BinaryJSON(stream)
+        target(Event((
+            ('datetime', datetime(2016, 3, 11, 5, 45)),
+            ('date', date(2016, 3, 11)),
+            ('time', time(5, 45)),
+            ('decimal', Decimal('1.10')),
+            ('uuid', UUID('12345678123456781234567812345678')),
+            ('bytes', u"\u00A3".encode('latin1')),
+            ('exception', ValueError('bad')),
+            ('other', object),
+        )))
+        compare(json_loads(stream.getvalue().decode('ascii')), expected={
+            'datetime': '2016-03-11T05:45:00',
+            'date': '2016-03-11',
+            'time': '05:45:00',
+            'decimal': '1.10',
+            'uuid': '12345678-1234-5678-1234-567812345678',
+            'bytes': "b'\\xa3'",
+            'exception': "ValueError('bad')",
+            'other': "<class 'object'>",
+        })
+
+    def test_custom_encoder(self):
+        class Point(object):
+            def __init__(self, x, y):
+                self.x, self.y = x, y
+
+        class SubPoint(Point):
+            pass
+
+        stream = BytesIO()
+        target = BinaryJSON(stream, encoders={Point: lambda p: [p.x, p.y]})
+        target(Event(p=Point(1, 2), s=SubPoint(3, 4)))
+        compare(stream.getvalue(), expected=b'{"p":[1,2],"s":[3,4]}\n')
+        assert target.encoder_for(SubPoint) is target.resolved[SubPoint]
+
+    def test_floats(self):
+        stream = BytesIO()
+        target = BinaryJSON(stream)
+        target(Event(nan=float('nan'), p_inf=float('inf')))
+        compare(stream.getvalue(),
+                expected=b'{"nan":NaN,"p_inf":Infinity}\n')
+
+    def test_to_path_append(self, dir):
+        path = dir.write('test.log', b'{}\n')
+        target = BinaryJSON(path)
+        target(Event(x=u'\u00A3'))
+        target.close()
+        compare(dir.read('test.log'), expected=b'{}\n{"x":"\\u00a3"}\n')
+
+    def test_buffered(self):
+        stream = BytesIO()
+        target = BinaryJSON(stream, buffer_size=12)
+        target(Event(x=1))
+        compare(stream.getvalue(), expected=b'')
+        target(Event(x=2))
+        compare(stream.getvalue(), expected=b'{"x":1}\n{"x":2}\n')
+
+    def test_lazy(self):
+        stream = BytesIO()
+        logger = Logger(BinaryJSON(stream), lazy=True).bind(x=1)
+        logger.info(y=2)
+        logger.info(x=3)
+        compare(stream.getvalue(), expected=(
+            b'{"x":1,"y":2,"level":"info"}\n'
+            b'{"x":3,"level":"info"}\n'
+        ))
+
+
+class TestRaw(object):
+
+    def test_path(self, dir):
+        target = Human(dir.getpath('test.log'), raw=True)
+        assert isinstance(target.stream, RawStream)
+        target(Event((('x', 1), ('pound', u'\u00A3'))))
+        target(Event(y=u'a\nb'))
+        target.close()
+        compare(dir.read('test.log', encoding='utf-8'),
+                expected=u"x=1, pound='\u00A3'\n\ny:\na\nb\n")
+
+    def test_append(self, dir):
+        path = dir.write('test.log', b'{}\n')
+        target = LTSV(path, raw=True)
+        target(Event(x=1))
+        target.close()
+        compare(dir.read('test.log'), expected=b'{}\nx:1\n')
+
+    def test_encoding_errors(self, dir):
+        fd = os.open(dir.getpath('test.log'), os.O_WRONLY | os.O_CREAT)
+        target = LTSV(RawStream(fd, encoding='ascii'))
+        target(Event(pound=u"\u00A3"))
+        target.close()
+        compare(dir.read('test.log'), expected=b"pound:\\xa3\n")
+
+    def test_binary_serializer(self, dir):
+        target = BinaryJSON(dir.getpath('test.log'), raw=True)
+        target(Event(x=1))
+        target.close()
+        compare(dir.read('test.log'), expected=b'{"x":1}\n')
+
+    def test_buffered(self, dir):
+        target = LTSV(dir.getpath('test.log'), raw=True, buffer_size=10)
+        target(Event(x=1))
+        compare(dir.read('test.log'), expected=b'')
+        target(Event(x=2))
+        target(Event(x=3))
+        compare(dir.read('test.log'), expected=b'x:1\nx:2\nx:3\n')
+        target.close()
+
+    @pytest.mark.skipif(not hasattr(os, 'writev'), reason='needs writev')
+    def test_parts_not_joined(self, dir):
+        calls = []
+
+        def writev(fd, parts):
+            calls.append(list(parts))
+            return os_writev(fd, parts)
+
+        os_writev = os.writev
+        target = Human(dir.getpath('test.log'), prefix='{level}: ', raw=True)
+        with Replace('os.writev', writev):
+            target(Event(level='info', x=1))
+        target.close()
+        compare(calls, expected=[[b'info: x=1', b'\n']])
+        compare(dir.read('test.log'), expected=b'info: x=1\n')
+
+    @pytest.mark.skipif(not hasattr(os, 'writev'), reason='needs writev')
+    def test_partial_writev(self, dir):
+        def writev(fd, parts):
+            return os.write(fd, parts[0][:2])
+
+        path = dir.getpath('test.log')
+        stream = RawStream(os.open(path, os.O_WRONLY | os.O_CREAT))
+        with Replace('os.writev', writev):
+            stream.writelines([u'abc', b'def', u'\u00A3'])
+        stream.close()
+        compare(dir.read('test.log'), expected=b'abcdef\xc2\xa3')
+
+    def test_many_parts(self, dir):
+        path = dir.getpath('test.log')
+        stream = RawStream(os.open(path, os.O_WRONLY | os.O_CREAT))
+        stream.max_parts = 2
+        stream.writelines([u'a', u'b', u'c', u'd', u'e'])
+        stream.close()
+        compare(dir.read('test.log'), expected=b'abcde')
+
+    def test_no_writev(self, dir):
+        path = dir.getpath('test.log')
+        stream = RawStream(os.open(path, os.O_WRONLY | os.O_CREAT))
+        with Replace('os.writev', not_there):
+            stream.writelines([u'a', b'b'])
+        stream.close()
+        compare(dir.read('test.log'), expected=b'ab')
+
+    def test_raw_stream(self):
+        read_fd, write_fd = os.pipe()
+        try:
+            with Replace('sys.stdout', os.fdopen(write_fd, 'w')) as stdout:
+                stream = raw_stream(sys.stdout)
+                stdout.close()
+            stream.write(u'\u00A3')
+            stream.write(b'\n')
+            stream.close()
+            compare(os.read(read_fd, 10), expected=b'\xc2\xa3\n')
+        finally:
+            os.close(read_fd)